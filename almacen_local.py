@@ -0,0 +1,170 @@
+import json
+import os
+import sqlite3
+import threading
+
+from registros import CAMPOS, codificar, decodificar
+from sincronizacion import coleccion_de, particion, partes_ruta
+
+RUTA_DB_LOCAL = os.environ.get("CAJA_DB_LOCAL", os.path.join(os.path.dirname(os.path.abspath(__file__)), "caja_local.db"))
+
+
+class AlmacenLocal:
+    # Copia local de la base: se lee al arrancar y se escribe antes que la nube.
+    # "pendientes" es la bandeja de salida con los cambios que todavía no llegaron a Firebase.
+    def __init__(self, ruta=RUTA_DB_LOCAL):
+        self.lock = threading.Lock()
+        self.conexion = sqlite3.connect(ruta, check_same_thread=False)
+        with self.lock, self.conexion:
+            self.conexion.execute("PRAGMA journal_mode=WAL")
+            self.conexion.execute(
+                "CREATE TABLE IF NOT EXISTS registros ("
+                "coleccion TEXT NOT NULL, clave TEXT NOT NULL, datos TEXT NOT NULL, particion TEXT NOT NULL DEFAULT '', "
+                "PRIMARY KEY (coleccion, clave))"
+            )
+            columnas = [fila[1] for fila in self.conexion.execute("PRAGMA table_info(registros)")]
+            if "particion" not in columnas:
+                # Copias locales anteriores al esquema por mes
+                self.conexion.execute("ALTER TABLE registros ADD COLUMN particion TEXT NOT NULL DEFAULT ''")
+                filas = self.conexion.execute("SELECT coleccion, clave, datos FROM registros").fetchall()
+                self.conexion.executemany(
+                    "UPDATE registros SET particion = ? WHERE coleccion = ? AND clave = ?",
+                    [(particion(c, decodificar(c, json.loads(d))) or "", c, k) for c, k, d in filas],
+                )
+            # Filas guardadas antes del formato compacto: se reescriben una sola vez
+            viejas = self.conexion.execute(
+                f"SELECT coleccion, clave, datos FROM registros WHERE coleccion IN ({', '.join('?' * len(CAMPOS))}) "
+                "AND datos LIKE '{%'", tuple(CAMPOS),
+            ).fetchall()
+            self._escribir({(c, k): json.loads(d) for c, k, d in viejas})
+            self.conexion.execute("CREATE INDEX IF NOT EXISTS registros_particion ON registros (coleccion, particion)")
+            self.conexion.execute(
+                "CREATE TABLE IF NOT EXISTS pendientes ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, cambios TEXT NOT NULL)"
+            )
+            # Cambios que la nube rechazó por su contenido: salen de la bandeja y quedan para revisar a mano
+            self.conexion.execute(
+                "CREATE TABLE IF NOT EXISTS apartados ("
+                "id INTEGER PRIMARY KEY, cambios TEXT NOT NULL, error TEXT NOT NULL, fecha TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+            )
+            # ETag de la nube con el que se sincronizó por última vez cada partición
+            self.conexion.execute(
+                "CREATE TABLE IF NOT EXISTS etags ("
+                "coleccion TEXT NOT NULL, particion TEXT NOT NULL, etag TEXT NOT NULL, PRIMARY KEY (coleccion, particion))"
+            )
+
+    def cargar(self, particiones):
+        # particiones: [(coleccion, mes o None)] -> {(coleccion, mes): {clave: registro}}
+        # El archivo frío se guarda con su propia colección ("archivo/movimientos") y el mismo formato
+        datos = {}
+        with self.lock:
+            for coleccion, mes in particiones:
+                filas = self.conexion.execute(
+                    "SELECT clave, datos FROM registros WHERE coleccion = ? AND particion = ? ORDER BY rowid",
+                    (coleccion, mes or ""),
+                ).fetchall()
+                datos[(coleccion, mes)] = {
+                    clave: decodificar(coleccion_de(coleccion), json.loads(registro)) for clave, registro in filas
+                }
+        return datos
+
+    def buscar(self, coleccion, texto="", campo="proveedor", desde=0, cantidad=20):
+        # Una página de la colección, de lo más nuevo a lo más viejo, filtrando por un campo -> (registros, total)
+        condicion = "coleccion = ? AND json_extract(datos, '$.' || ?) LIKE ?"
+        parametros = (coleccion, campo, f"%{texto.strip()}%")
+        with self.lock:
+            total = self.conexion.execute(f"SELECT COUNT(*) FROM registros WHERE {condicion}", parametros).fetchone()[0]
+            filas = self.conexion.execute(
+                f"SELECT clave, datos FROM registros WHERE {condicion} "
+                "ORDER BY json_extract(datos, '$.fecha') DESC, clave DESC LIMIT ? OFFSET ?",
+                parametros + (cantidad, desde),
+            ).fetchall()
+        return [(clave, json.loads(registro)) for clave, registro in filas], total
+
+    def guardar(self, registros, cambios=None):
+        # registros: {(coleccion, clave): registro o None}. Si hay cambios, quedan encolados para la nube.
+        with self.lock, self.conexion:
+            self._escribir(registros)
+            if cambios:
+                self.conexion.execute("INSERT INTO pendientes (cambios) VALUES (?)", (json.dumps(cambios),))
+
+    def guardar_remoto(self, registros):
+        # Lo traído de la nube no pisa registros con cambios propios sin subir.
+        # Devuelve solo lo que efectivamente cambió en la copia local.
+        with self.lock, self.conexion:
+            pendientes = set()
+            for (cambios,) in self.conexion.execute("SELECT cambios FROM pendientes"):
+                for ruta in json.loads(cambios):
+                    partes = partes_ruta(ruta)
+                    if partes:
+                        pendientes.add((partes[0], partes[2]))
+            aplicados = {}
+            for (coleccion, clave), registro in registros.items():
+                if (coleccion, clave) in pendientes or self._leer(coleccion, clave) == registro:
+                    continue
+                aplicados[(coleccion, clave)] = registro
+            self._escribir(aplicados)
+        return aplicados
+
+    def leer(self, coleccion, clave):
+        with self.lock:
+            return self._leer(coleccion, clave)
+
+    def _leer(self, coleccion, clave):
+        fila = self.conexion.execute(
+            "SELECT datos FROM registros WHERE coleccion = ? AND clave = ?", (coleccion, clave)
+        ).fetchone()
+        return decodificar(coleccion_de(coleccion), json.loads(fila[0])) if fila else None
+
+    def _escribir(self, registros):
+        for (coleccion, clave), registro in registros.items():
+            if registro is None:
+                self.conexion.execute("DELETE FROM registros WHERE coleccion = ? AND clave = ?", (coleccion, clave))
+            else:
+                self.conexion.execute(
+                    "INSERT OR REPLACE INTO registros (coleccion, clave, datos, particion) VALUES (?, ?, ?, ?)",
+                    (coleccion, clave, json.dumps(codificar(coleccion_de(coleccion), registro), separators=(",", ":")),
+                     particion(coleccion_de(coleccion), registro) or ""),
+                )
+
+    def etags(self, particiones):
+        with self.lock:
+            etags = {}
+            for coleccion, mes in particiones:
+                fila = self.conexion.execute(
+                    "SELECT etag FROM etags WHERE coleccion = ? AND particion = ?", (coleccion, mes or "")
+                ).fetchone()
+                if fila:
+                    etags[(coleccion, mes)] = fila[0]
+        return etags
+
+    def guardar_etags(self, etags):
+        with self.lock, self.conexion:
+            self.conexion.executemany(
+                "INSERT OR REPLACE INTO etags (coleccion, particion, etag) VALUES (?, ?, ?)",
+                [(coleccion, mes or "", etag) for (coleccion, mes), etag in etags.items()],
+            )
+
+    def pendientes(self):
+        with self.lock:
+            filas = self.conexion.execute("SELECT id, cambios FROM pendientes ORDER BY id").fetchall()
+        return [(id_, json.loads(cambios)) for id_, cambios in filas]
+
+    def confirmar(self, ids):
+        with self.lock, self.conexion:
+            self.conexion.executemany("DELETE FROM pendientes WHERE id = ?", [(i,) for i in ids])
+
+    def apartar(self, id_, error):
+        with self.lock, self.conexion:
+            self.conexion.execute(
+                "INSERT INTO apartados (id, cambios, error) SELECT id, cambios, ? FROM pendientes WHERE id = ?", (error, id_)
+            )
+            self.conexion.execute("DELETE FROM pendientes WHERE id = ?", (id_,))
+
+    def contar_apartados(self):
+        with self.lock:
+            return self.conexion.execute("SELECT COUNT(*) FROM apartados").fetchone()[0]
+
+    def contar_pendientes(self):
+        with self.lock:
+            return self.conexion.execute("SELECT COUNT(*) FROM pendientes").fetchone()[0]
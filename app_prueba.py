@@ -1,34 +1,402 @@
+import bisect
 import flet as ft
-import requests
 import os
+import re
+import secrets
+import threading
+import time
 from datetime import datetime, date, timedelta
 
-# --- CONEXIÓN A FIREBASE EN LA NUBE ---
-FIREBASE_URL = "https://cajarepuestos-214aa-default-rtdb.firebaseio.com/caja_repuestos.json"
+from almacen_local import AlmacenLocal
+from compactacion import compactar_meses_cerrados
+from exportar import exportar_excel, vencimiento
+from metricas import METRICAS
+from registros import CATEGORIAS, FILAS, MEDIOS, USUARIOS, pesos
+from sincronizacion import (
+    COLECCIONES, COLECCIONES_RESUMIDAS, FACTURAS_PAGADAS, MESES_EN_VIVO, Reconciliador, _a_diccionario, alcance,
+    alcance_archivo, descargar_nube, meses_hasta, nueva_clave, partes_ruta, ruta_archivo, ruta_registro
+)
 
-def cargar_datos():
+DIR_ASSETS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+DIR_EXPORTACIONES = os.path.join(DIR_ASSETS, "exportaciones")
+DIAS_AVISO_VENCIMIENTO = 3
+FACTURAS_POR_PAGINA = 20
+# Cada cuántos segundos se escribe la línea de métricas en el log (0 la desactiva)
+INTERVALO_METRICAS = int(os.environ.get("CAJA_INTERVALO_METRICAS", 300))
+# Segundos que el login espera la carga de datos antes de avisar y devolver el botón
+ESPERA_DATOS = int(os.environ.get("CAJA_ESPERA_DATOS", 120))
+
+# --- DATOS LOCALES Y SINCRONIZACIÓN ---
+_servicios = {}
+_servicios_lock = threading.Lock()
+_compactando = threading.Lock()
+
+def iniciar_servicios(almacen=None, en_segundo_plano=True):
+    # Un solo almacén, una sola bd en memoria y un solo reconciliador por proceso:
+    # todas las pestañas y dispositivos conectados comparten los mismos datos.
+    # Sin segundo plano (benchmarks) el reconciliador se maneja a mano.
+    # Si la carga falla no queda nada a medias: la próxima sesión la reintenta desde cero.
+    with _servicios_lock:
+        if not _servicios:
+            almacen = almacen or AlmacenLocal()
+            servicios = {"almacen": almacen, "bd": cargar_datos(almacen), "candado": threading.RLock(), "sesiones": {}}
+            servicios["reconciliador"] = Reconciliador(almacen)
+            servicios["reconciliador"].oyentes.append(_al_cambiar_remoto)
+            _servicios.update(servicios)
+            if en_segundo_plano:
+                _servicios["reconciliador"].iniciar()
+                _servicios["reconciliador"].escuchar_en_vivo()
+                if INTERVALO_METRICAS:
+                    threading.Thread(target=_informar_metricas, name="metricas", daemon=True).start()
+    return _servicios
+
+def _informar_metricas():
+    while True:
+        time.sleep(INTERVALO_METRICAS)
+        print(METRICAS.texto(), flush=True)
+
+def registrar_sesion(session_id, pubsub):
+    # pubsub None da de baja la sesión
+    with _servicios_lock:
+        if pubsub is None:
+            _servicios["sesiones"].pop(session_id, None)
+        else:
+            _servicios["sesiones"][session_id] = pubsub
+        METRICAS.fijar("sesiones_activas", len(_servicios["sesiones"]))
+
+def _al_cambiar_remoto(registros):
+    with _servicios["candado"]:
+        aplicar_registros(_servicios["bd"], registros)
+    difundir(registros)
+
+def difundir(registros):
+    # El hub de pubsub es del proceso: cualquier cliente de sesión llega a todas las sesiones
+    with _servicios_lock:
+        pubsub = next(iter(_servicios["sesiones"].values()), None)
+    if pubsub is not None:
+        pubsub.send_all({"colecciones": {c for c, _ in registros}})
+
+def cargar_datos(almacen, meses=None):
+    # Lectura local en milisegundos y solo de los meses en uso: la nube se reconcilia después
+    meses = meses or meses_hasta(date.today(), MESES_EN_VIVO)
+    bd = {c: {} for c in COLECCIONES}
+    with METRICAS.medir("local.carga_ms"):
+        for (coleccion, _), registros in almacen.cargar(alcance(meses)).items():
+            if coleccion in FILAS:
+                registros = {clave: FILAS[coleccion](registro) for clave, registro in registros.items()}
+            bd[coleccion].update(registros)
+        bd["meses"] = set(meses)
+        return construir_indices(bd)
+
+def asegurar_meses(meses):
+    # Carga perezosa de meses viejos: primero la copia local y después, en segundo plano, la nube.
+    # Devuelve True si hubo que cargar algo.
+    bd, almacen = _servicios["bd"], _servicios["almacen"]
+    with _servicios["candado"]:
+        faltan = [m for m in meses if m not in bd["meses"]]
+        if not faltan:
+            return False
+        registros = {}
+        with METRICAS.medir("local.carga_meses_ms"):
+            for (coleccion, _), datos in almacen.cargar(alcance(faltan, con_planas=False)).items():
+                registros.update({(coleccion, clave): registro for clave, registro in datos.items()})
+            aplicar_registros(bd, registros)
+            bd["meses"].update(faltan)
+    # De los meses cerrados se trae también el archivo frío, así quedan en disco para exportar sin conexión
+    cerrados = [m for m in faltan if m in bd["resumenes"]]
+    _servicios["reconciliador"].pedir_particiones(alcance(faltan, con_planas=False) + alcance_archivo(cerrados))
+    return True
+
+def leer_particion(coleccion, mes):
+    # Para exportar: los meses en uso salen de la copia local (ya sincronizada),
+    # los viejos se piden a la nube y, sin conexión o si no cambiaron desde la última bajada
+    # (mismo ETag: se baja pero no se parsea), se usa lo que haya en disco
+    almacen = _servicios["almacen"]
+    particion_ = (coleccion, mes)
+    if coleccion in COLECCIONES_RESUMIDAS and mes in _servicios["bd"]["resumenes"]:
+        # Mes cerrado: las filas están en el archivo frío, más las que hayan llegado tarde. Las dos particiones
+        # pasan por la copia local; si no hay nube ni copia del archivo, el mes no se puede exportar entero
+        archivada = (ruta_archivo(coleccion), mes)
+        if not _servicios["reconciliador"].traer([archivada, particion_]) and not almacen.etags([archivada]):
+            raise ConnectionError(f"Sin conexión y sin copia local del archivo de {coleccion} {mes}")
+        datos = almacen.cargar([archivada, particion_])
+        return {**datos[archivada], **datos[particion_]}
+    if coleccion != FACTURAS_PAGADAS and (mes is None or mes in _servicios["bd"]["meses"]):
+        return almacen.cargar([particion_])[particion_]
+    remoto = descargar_nube([particion_], almacen.etags([particion_]))
+    if remoto is None or particion_ not in remoto:
+        return almacen.cargar([particion_])[particion_]
+    return remoto[particion_]
+
+def compactar_en_segundo_plano(usuario):
+    # Se dispara con el cierre diario; una sola compactación a la vez por proceso
+    if not _compactando.acquire(blocking=False):
+        return
     try:
-        respuesta = requests.get(FIREBASE_URL, timeout=10)
-        if respuesta.status_code == 200:
-            data = respuesta.json()
-            if data is None:
-                return {"movimientos": [], "gastos": [], "facturas_pendientes": [], "cierres": []}
-            return {
-                "movimientos": data.get("movimientos") or [],
-                "gastos": data.get("gastos") or [],
-                "facturas_pendientes": data.get("facturas_pendientes") or [],
-                "cierres": data.get("cierres") or []
-            }
+        meses = compactar_meses_cerrados(date.today(), _servicios["almacen"], usuario)
     except Exception as e:
-        print(f"Alerta: No se pudo conectar a la nube. {e}")
-    
-    return {"movimientos": [], "gastos": [], "facturas_pendientes": [], "cierres": []}
+        print(f"Alerta: No se pudo compactar los meses cerrados. {e}")
+        return
+    finally:
+        _compactando.release()
+    if meses:
+        # Trae los resúmenes nuevos, las particiones ya vacías y el archivo: en la copia local las filas
+        # pasan del mes al archivo frío en una sola escritura
+        _servicios["reconciliador"].pedir_particiones(
+            [(c, m) for c in COLECCIONES_RESUMIDAS for m in meses] + alcance_archivo(meses) + [("resumenes", None)]
+        )
+
+def nueva_exportacion(desde, hasta):
+    # Los archivos se sirven como assets: nombre no adivinable y se borran los de más de una hora
+    os.makedirs(DIR_EXPORTACIONES, exist_ok=True)
+    for nombre in os.listdir(DIR_EXPORTACIONES):
+        ruta = os.path.join(DIR_EXPORTACIONES, nombre)
+        if time.time() - os.path.getmtime(ruta) > 3600:
+            os.remove(ruta)
+    return f"caja_{desde:%Y%m%d}_{hasta:%Y%m%d}_{secrets.token_hex(8)}.xlsx"
+
+# --- ÍNDICES EN MEMORIA ---
+# bd["por_dia"][fecha] = {"ingresos": {medio: total}, "gastos": {clave: Gasto}}
+# bd["por_mes"]["YYYY-MM"] y bd["por_año"]["YYYY"] = {"ingresos", "gastos", "por_medio", "por_categoria"}
+# Todos los totales son centavos enteros; los movimientos y gastos en memoria son filas compactas (registros.py)
+# bd["vencimientos"] = [(vencimiento, clave)] de las facturas pendientes, ordenada por fecha
+# Los meses con resumen en bd["resumenes"] suman a por_mes y por_año desde el resumen, no desde las filas
+def _dia(bd, fecha):
+    return bd["por_dia"].setdefault(fecha, {"ingresos": {}, "gastos": {}})
+
+def _acumular(tabla, clave, monto):
+    tabla[clave] = tabla.get(clave, 0) + monto
+
+def _periodo_vacio():
+    return {"ingresos": 0, "gastos": 0, "por_medio": {}, "por_categoria": {}}
+
+def _periodos(bd, fecha):
+    # La fecha ISO se corta una sola vez al indexar: no hace falta parsearla
+    if fecha[:7] in bd["resumenes"]:
+        return
+    for indice, clave in (("por_mes", fecha[:7]), ("por_año", fecha[:4])):
+        yield bd[indice].setdefault(clave, _periodo_vacio())
+
+def _indexar_resumen(bd, mes, resumen, signo):
+    # El resumen reemplaza en por_mes lo que hayan sumado las filas del mes y corrige el año
+    año = bd["por_año"].setdefault(mes[:4], _periodo_vacio())
+    anterior = bd["por_mes"].pop(mes, None)
+    nuevo = None
+    if signo > 0:
+        nuevo = {
+            "ingresos": resumen.get("ingresos", 0), "gastos": resumen.get("gastos", 0),
+            "por_medio": {e["medio"]: e["total"] for e in _a_diccionario(resumen.get("por_medio")).values()},
+            "por_categoria": {e["categoria"]: e["total"] for e in _a_diccionario(resumen.get("por_categoria")).values()},
+        }
+        bd["por_mes"][mes] = nuevo
+    for periodo, factor in ((anterior, -1), (nuevo, 1)):
+        if periodo:
+            año["ingresos"] += factor * periodo["ingresos"]
+            año["gastos"] += factor * periodo["gastos"]
+            for tabla in ("por_medio", "por_categoria"):
+                for clave, monto in periodo[tabla].items():
+                    _acumular(año[tabla], clave, factor * monto)
+
+def indexar(bd, coleccion, clave, registro, signo=1):
+    if coleccion == "movimientos":
+        fecha, monto = registro.fecha, signo * registro.centavos
+        _acumular(_dia(bd, fecha)["ingresos"], registro.medio, monto)
+        for periodo in _periodos(bd, fecha):
+            periodo["ingresos"] += monto
+            _acumular(periodo["por_medio"], registro.medio, monto)
+    elif coleccion == "gastos":
+        fecha, monto = registro.fecha, signo * registro.centavos
+        gastos = _dia(bd, fecha)["gastos"]
+        if signo > 0:
+            gastos[clave] = registro
+        else:
+            gastos.pop(clave, None)
+        for periodo in _periodos(bd, fecha):
+            periodo["gastos"] += monto
+            _acumular(periodo["por_categoria"], registro.categoria, monto)
+    elif coleccion == "resumenes":
+        _indexar_resumen(bd, clave, registro, signo)
+    elif coleccion == "facturas_pendientes" and registro.get("estado") == "PENDIENTE":
+        # La fecha de vencimiento se parsea una sola vez, al entrar o salir del índice
+        venc = vencimiento(registro)
+        if venc is None:
+            return
+        if signo > 0:
+            bisect.insort(bd["vencimientos"], (venc, clave))
+        else:
+            i = bisect.bisect_left(bd["vencimientos"], (venc, clave))
+            if i < len(bd["vencimientos"]) and bd["vencimientos"][i] == (venc, clave):
+                del bd["vencimientos"][i]
+
+def construir_indices(bd):
+    bd["por_dia"] = {}
+    bd["por_mes"] = {}
+    bd["por_año"] = {}
+    bd["vencimientos"] = []
+    for coleccion in COLECCIONES:
+        for clave, registro in bd[coleccion].items():
+            indexar(bd, coleccion, clave, registro)
+    return bd
+
+def quitar_registro(bd, coleccion, clave):
+    anterior = bd[coleccion].pop(clave, None)
+    if anterior is not None:
+        indexar(bd, coleccion, clave, anterior, -1)
+
+def fijar_registro(bd, coleccion, clave, registro):
+    # Único punto de alta/reemplazo: mantiene los índices al día sin recorrer el historial
+    anterior = bd[coleccion].get(clave)
+    if anterior is not None:
+        indexar(bd, coleccion, clave, anterior, -1)
+    if coleccion in FILAS:
+        registro = FILAS[coleccion](registro)
+    bd[coleccion][clave] = registro
+    indexar(bd, coleccion, clave, registro)
 
-def guardar_datos(datos):
+def aplicar_registros(bd, registros):
+    # registros: {(coleccion, clave): registro completo o None para borrarlo}.
+    # El archivo de facturas pagadas vive solo en disco y no entra en la bd en memoria.
+    for (coleccion, clave), registro in registros.items():
+        if coleccion not in COLECCIONES:
+            continue
+        if registro is None:
+            quitar_registro(bd, coleccion, clave)
+        else:
+            fijar_registro(bd, coleccion, clave, registro)
+
+def aplicar_cambios(bd, cambios):
+    # cambios con rutas de Firebase ("movimientos/2026-10/clave", "facturas_pendientes/clave/estado");
+    # devuelve los registros completos resultantes
+    registros = {}
+    for ruta, valor in cambios.items():
+        partes = partes_ruta(ruta)
+        if partes is None or partes[2] is None:
+            continue
+        coleccion, _, clave, campos = partes
+        if campos:
+            registro = dict(registros.get((coleccion, clave)) or bd[coleccion].get(clave) or {})
+            registro[campos[0]] = valor
+            valor = registro
+        registros[(coleccion, clave)] = valor
+    aplicar_registros(bd, registros)
+    return registros
+
+def facturas_por_vencer(bd, hasta):
+    # El índice está ordenado: se corta en la primera factura que vence después de 'hasta'
+    for venc, clave in bd["vencimientos"]:
+        if venc > hasta:
+            break
+        yield clave, bd["facturas_pendientes"][clave], venc
+
+# --- ESTADÍSTICAS ---
+def _mes_anterior(año, mes):
+    return (año, mes - 1) if mes > 1 else (año - 1, 12)
+
+def _periodo(bd, indice, clave):
+    return bd[indice].get(clave, _periodo_vacio())
+
+def variacion(actual, anterior):
+    return ((actual - anterior) / anterior) * 100 if anterior > 0 else None
+
+def meses_estadisticas(bd, hoy):
+    # Las comparativas anuales necesitan desde enero del año anterior hasta el mes en curso;
+    # los meses cerrados ya están en memoria como resumen y no hace falta cargar sus filas
+    return [m for m in meses_hasta(hoy, 12 + hoy.month) if m not in bd["resumenes"]]
+
+def _ingresos_hasta(bd, mes, dia):
+    # Ingresos del mes desde el 1 hasta 'dia' inclusive: del resumen si el mes está cerrado, si no de por_dia
+    limite = f"{mes}-{dia:02d}"
+    if mes in bd["resumenes"]:
+        por_dia = _a_diccionario(bd["resumenes"][mes].get("por_dia")).values()
+        return sum(e.get("ingresos", 0) for e in por_dia if e.get("fecha", "") <= limite)
+    return sum(sum(bd["por_dia"].get(f"{mes}-{d:02d}", {}).get("ingresos", {}).values()) for d in range(1, dia + 1))
+
+def estadisticas(bd, hoy):
+    año_ant, mes_ant = _mes_anterior(hoy.year, hoy.month)
+    mes_actual = _periodo(bd, "por_mes", f"{hoy.year:04d}-{hoy.month:02d}")
+    # El año anterior se compara contra el mismo tramo del año en curso: meses completos hasta el anterior
+    # y el mes actual cortado en el día de hoy
+    acumulado_año_ant = sum(_periodo(bd, "por_mes", f"{hoy.year - 1:04d}-{m:02d}")["ingresos"] for m in range(1, hoy.month))
+    acumulado_año_ant += _ingresos_hasta(bd, f"{hoy.year - 1:04d}-{hoy.month:02d}", hoy.day)
+    return {
+        "mes_actual": mes_actual,
+        "mes_anterior": _periodo(bd, "por_mes", f"{año_ant:04d}-{mes_ant:02d}"),
+        "mes_año_anterior": _periodo(bd, "por_mes", f"{hoy.year - 1:04d}-{hoy.month:02d}"),
+        "año_actual": _periodo(bd, "por_año", f"{hoy.year:04d}"),
+        "ingresos_año_anterior_a_la_fecha": acumulado_año_ant,
+    }
+
+# --- MONTOS ESCRITOS A MANO ---
+# Un solo criterio para todos los campos de monto: ingresos, egresos, facturas y carga por lotes
+_MILES = re.compile(r"\d{1,3}(\.\d{3})+")
+
+def _leer_monto(texto):
+    # Acepta "1500", "1500.50", "1500,50", "1.500", "$1.500,50", "1.500.000"; None si no es un monto positivo.
+    # Un punto seguido de tres cifras separa miles, como se escribe en el mostrador: "1.500" son mil quinientos.
+    # Si los puntos no agrupan de a tres ("1500.500", "1.50,5") el monto es ambiguo y se rechaza.
+    entero, coma, decimales = texto.replace("$", "").strip().partition(",")
+    if _MILES.fullmatch(entero):
+        entero = entero.replace(".", "")
+    elif "." in entero and (coma or re.search(r"\.\d{3}$", entero)):
+        return None
+    texto = f"{entero}.{decimales}" if coma else entero
     try:
-        requests.put(FIREBASE_URL, json=datos, timeout=10)
-    except Exception as e:
-        print(f"Error crítico al guardar en la nube: {e}")
+        monto = float(texto)
+    except ValueError:
+        return None
+    return monto if 0 < monto < float("inf") else None
+
+# --- CARGA POR LOTES ---
+def _leer_medio(texto, por_defecto):
+    # "e", "efvo", "t", "tarjeta", "virtual"...: el primer medio que empiece con esa palabra
+    if not texto:
+        return por_defecto
+    texto = texto.lower()
+    return next((m for m in MEDIOS if any(p.startswith(texto) for p in m.lower().split(" / "))), None)
+
+def leer_lote(texto, medio_por_defecto):
+    # Una venta por línea: "monto [medio]". Devuelve [(número de línea, monto, medio, error o None)]
+    filas = []
+    for numero, linea in enumerate(texto.splitlines(), 1):
+        partes = linea.split(maxsplit=1)
+        if not partes:
+            continue
+        monto = _leer_monto(partes[0])
+        medio = _leer_medio(partes[1].strip() if len(partes) > 1 else "", medio_por_defecto)
+        error = None
+        if monto is None:
+            error = f"'{partes[0]}' no es un monto válido"
+        elif medio is None:
+            error = f"medio desconocido '{partes[1].strip()}'"
+        filas.append((numero, monto, medio, error))
+    return filas
+
+# --- ACTUALIZACIÓN INCREMENTAL DE CONTROLES ---
+def _poner(control, cambiados, **propiedades):
+    # Asigna solo lo que cambió y anota el control para mandarlo en el próximo page.update(...)
+    distintas = {k: v for k, v in propiedades.items() if getattr(control, k) != v}
+    if distintas:
+        for k, v in distintas.items():
+            setattr(control, k, v)
+        cambiados.append(control)
+
+def sincronizar_controles(controles, existentes, items, crear, refrescar, cambiados, contenedor, fijos=()):
+    # Reutiliza los controles ya dibujados (existentes: {clave: control}): crea solo los nuevos,
+    # quita los que sobran y refresca valores. El contenedor se reenvía solo si cambió la lista.
+    nuevos = []
+    for clave, datos in items:
+        control = existentes.get(clave)
+        if control is None:
+            control = existentes[clave] = crear(clave, datos)
+        else:
+            refrescar(control, datos, cambiados)
+        nuevos.append(control)
+    for clave in existentes.keys() - {clave for clave, _ in items}:
+        del existentes[clave]
+    nuevos.extend(fijos)
+    if len(nuevos) != len(controles) or any(a is not b for a, b in zip(nuevos, controles)):
+        controles[:] = nuevos
+        cambiados.append(contenedor)
 
 def main(page: ft.Page):
     page.title = "Repuestera HAFID - Sistema de Gestión"
@@ -39,20 +407,89 @@ def main(page: ft.Page):
     page.window.width = 500 
     page.window.height = 900
 
-    bd = cargar_datos()
+    inicio_pagina = time.perf_counter()
+    # Se asignan en preparar_datos, en segundo plano, cuando la bd compartida está lista
+    servicios = almacen = reconciliador = bd = candado = None
+    datos_listos = threading.Event()
+    carga = {"error": None}
     hoy_dt = date.today()
     hoy_str = str(hoy_dt)
     
     sesion = {"usuario": "", "fecha": hoy_str}
 
-    def mostrar_alerta(mensaje, color="red"):
-        snack = ft.SnackBar(ft.Text(mensaje, color="white"), bgcolor=color)
-        page.overlay.append(snack)
-        snack.open = True
+    # Un solo SnackBar por sesión, reutilizado: cada aviso manda solo ese control (y los que se le pasen)
+    alerta = ft.SnackBar(ft.Text("", color="white"))
+    page.overlay.append(alerta)
+
+    def mostrar_alerta(mensaje, color="red", *controles):
+        if alerta.open:
+            # Si el aviso anterior sigue a la vista se cierra primero para que el nuevo vuelva a aparecer
+            alerta.open = False
+            page.update(alerta)
+        alerta.content.value = mensaje
+        alerta.bgcolor = color
+        alerta.open = True
+        page.update(alerta, *controles)
+
+    # --- PANTALLA DE LOGIN ---
+    # Se dibuja antes que nada: los datos se cargan en segundo plano mientras se escribe la clave
+    sel_usuario = ft.Dropdown(label="Seleccionar Usuario", options=[ft.dropdown.Option(u) for u in USUARIOS], width=300)
+    
+    inp_clave = ft.TextField(label="Clave de Acceso", password=True, can_reveal_password=True, width=300)
+    
+    def loguear(e):
+        if not sel_usuario.value: return mostrar_alerta("Elegí un usuario.")
+        if inp_clave.value != "181214": return mostrar_alerta("Clave incorrecta.")
+
+        inicio = time.perf_counter()
+        if carga["error"] and datos_listos.is_set():
+            # Cada clic después de un fallo reintenta la carga
+            datos_listos.clear()
+            page.run_thread(preparar_datos)
+        if not datos_listos.is_set():
+            btn_entrar.disabled = True
+            btn_entrar.text = "Cargando datos..."
+            page.update(btn_entrar)
+            datos_listos.wait(ESPERA_DATOS)
+            btn_entrar.disabled = False
+            btn_entrar.text = "Iniciar Sesión"
+        if not datos_listos.is_set():
+            return mostrar_alerta("Los datos siguen cargando, probá de nuevo en un momento.", "red", btn_entrar)
+        if carga["error"]:
+            return mostrar_alerta(f"No se pudieron cargar los datos: {carga['error']}", "red", btn_entrar)
+        METRICAS.registrar("inicio.espera_datos_ms", (time.perf_counter() - inicio) * 1000)
+        
+        sesion["usuario"] = sel_usuario.value
+        
+        pantalla_login.visible = False
+        barra_navegacion.visible = True
+        mostrar_vista(0)
+        
+        refrescar_controles()
         page.update()
+        METRICAS.registrar("inicio.planilla_ms", (time.perf_counter() - inicio) * 1000)
+        revisar_alertas_emergentes() 
+
+    btn_entrar = ft.ElevatedButton("Iniciar Sesión", on_click=loguear, width=300, bgcolor="blue_900", color="white")
+    txt_error_carga = ft.Text("", color="red_700", visible=False, width=300)
+
+    pantalla_login = ft.Column([
+        ft.Text("REPUESTERA HAFID", size=30, weight="bold", color="blue_900"), 
+        ft.Text("Sistema de Gestión y Planilla Diaria", size=16, color="grey"),
+        ft.Divider(),
+        sel_usuario,
+        inp_clave,
+        ft.Container(height=10),
+        btn_entrar,
+        txt_error_carga
+    ], horizontal_alignment=ft.CrossAxisAlignment.CENTER)
+
+    page.add(pantalla_login)
+    METRICAS.registrar("inicio.login_ms", (time.perf_counter() - inicio_pagina) * 1000)
 
     # --- ELEMENTOS VISUALES PRINCIPALES ---
     txt_info_sesion = ft.Text("", size=16, weight="bold", color="blue_900")
+    txt_estado_sync = ft.Text("", size=12, color="grey")
     
     txt_ingresos_hoy = ft.Text("Ingresos Hoy: $0.00", size=16, color="green_700")
     txt_egresos_hoy = ft.Text("Egresos Hoy: $0.00", size=16, color="red_700")
@@ -60,6 +497,30 @@ def main(page: ft.Page):
     txt_saldo_semana = ft.Text("SALDO NETO SEMANAL: $0.00", size=16, weight="bold")
 
     # --- GRILLAS PLANILLA SEMANAL ---
+    # Las filas de ingresos son fijas (una por día y la de totales): solo cambian los valores de sus celdas
+    dias_nombres = ["LUNES", "MARTES", "MIERCOLES", "JUEVES", "VIERNES", "SABADO"]
+    celdas_ingresos = [(ft.Text("$0.00"), ft.Text("$0.00"), ft.Text("$0.00", weight="bold")) for _ in dias_nombres]
+    txt_total_efvo_sem = ft.Text("$0.00", color="green", weight="bold")
+    txt_total_tarj_sem = ft.Text("$0.00", color="green", weight="bold")
+    txt_total_ingresos_sem = ft.Text("$0.00", color="blue", weight="bold")
+    filas_ingresos = [
+        ft.DataRow(cells=[ft.DataCell(ft.Container(ft.Text(nombre), width=90)), *[ft.DataCell(t) for t in textos]])
+        for nombre, textos in zip(dias_nombres, celdas_ingresos)
+    ]
+    filas_ingresos.append(ft.DataRow(cells=[
+        ft.DataCell(ft.Text("TOTAL SEM", weight="bold")),
+        ft.DataCell(txt_total_efvo_sem),
+        ft.DataCell(txt_total_tarj_sem),
+        ft.DataCell(txt_total_ingresos_sem)
+    ]))
+
+    txt_total_egresos_sem = ft.Text("$0.00", color="red", weight="bold")
+    fila_total_egresos = ft.DataRow(cells=[
+        ft.DataCell(ft.Text("TOTAL EGRESOS", weight="bold")),
+        ft.DataCell(ft.Text("")),
+        ft.DataCell(txt_total_egresos_sem)
+    ])
+
     tabla_semana_ingresos = ft.DataTable(
         columns=[
             ft.DataColumn(ft.Container(ft.Text("DIA", weight="bold"), width=90)),
@@ -67,7 +528,7 @@ def main(page: ft.Page):
             ft.DataColumn(ft.Text("TARJETA", weight="bold")),
             ft.DataColumn(ft.Text("TOTAL", weight="bold")),
         ],
-        rows=[], heading_row_color="#E8F5E9", column_spacing=15
+        rows=filas_ingresos, heading_row_color="#E8F5E9", column_spacing=15
     )
 
     tabla_semana_egresos = ft.DataTable(
@@ -76,7 +537,7 @@ def main(page: ft.Page):
             ft.DataColumn(ft.Text("CATEGORÍA Y DETALLE", weight="bold")),
             ft.DataColumn(ft.Text("MONTO", weight="bold")),
         ],
-        rows=[], heading_row_color="#FFEBEE"
+        rows=[fila_total_egresos], heading_row_color="#FFEBEE"
     )
 
     # El scroll "auto" solo activa la barra horizontal si la pantalla es muy chica
@@ -87,159 +548,263 @@ def main(page: ft.Page):
     txt_est_mes_actual = ft.Text("Mes Actual: $0.00", size=16, weight="bold", color="green_700")
     txt_est_mes_anterior = ft.Text("Mes Anterior: $0.00", size=16)
     txt_est_crecimiento = ft.Text("Evolución: 0%", size=16, weight="bold")
+    txt_est_mes_año_anterior = ft.Text("Mismo Mes del Año Anterior: $0.00", size=16)
+    txt_est_interanual = ft.Text("Interanual: 0%", size=16, weight="bold")
+    txt_est_año_actual = ft.Text("Ingresos en lo que va del Año: $0.00", size=16, weight="bold", color="green_700")
+    txt_est_año_variacion = ft.Text("Contra el Año Anterior a la Fecha: 0%", size=16, weight="bold")
+    txt_sin_categorias = ft.Text("Sin egresos registrados este mes.", color="grey")
+    lista_gastos_categoria = ft.Column([txt_sin_categorias], spacing=5)
     
-    lista_facturas_pendientes = ft.Column(spacing=10)
+    txt_sin_facturas = ft.Text("✅ No hay facturas de proveedores pendientes.", color="green")
+    lista_facturas_pendientes = ft.Column([txt_sin_facturas], spacing=10)
 
     # --- LÓGICA DE ACTUALIZACIÓN DE VISTAS ---
+    def mostrar_variacion(txt, cambiados, etiqueta, actual, anterior):
+        cambio = variacion(actual, anterior)
+        if cambio is None:
+            _poner(txt, cambiados, value=f"{etiqueta}: N/A (Faltan datos previos)", color="grey")
+        else:
+            _poner(txt, cambiados, value=f"{etiqueta}: {cambio:+.2f}%", color="green" if cambio >= 0 else "red")
+
     def actualizar_ui():
-        txt_info_sesion.value = f"Operador: {sesion['usuario']} | Fecha: {datetime.now().strftime('%d/%m/%Y')}"
-        
+        inicio = time.perf_counter()
+        cambiados = refrescar_controles()
+        if cambiados:
+            page.update(*cambiados)
+        METRICAS.registrar("ui.actualizar_ms", (time.perf_counter() - inicio) * 1000)
+        METRICAS.registrar("ui.controles_actualizados", len(cambiados))
+
+    def refrescar_controles():
+        # Solo se calculan las vistas que ya se montaron en la página; devuelve los controles que cambiaron
+        cambiados = []
+        with candado:
+            refrescar_planilla(cambiados)
+            if 1 in vistas_montadas:
+                refrescar_estadisticas(cambiados)
+            if 2 in vistas_montadas:
+                refrescar_proveedores(cambiados)
+        return cambiados
+
+    def refrescar_planilla(cambiados):
+        _poner(txt_info_sesion, cambiados, value=f"Operador: {sesion['usuario']} | Fecha: {datetime.now().strftime('%d/%m/%Y')}")
+    
         inicio_semana = hoy_dt - timedelta(days=hoy_dt.weekday()) 
-        dias_nombres = ["LUNES", "MARTES", "MIERCOLES", "JUEVES", "VIERNES", "SABADO"]
-        
-        tabla_semana_ingresos.rows.clear()
+    
         total_efectivo_sem = 0
         total_tarjeta_sem = 0
         ingresos_hoy = 0
 
-        for i in range(6):
+        for i, (txt_efvo, txt_tarj, txt_total) in enumerate(celdas_ingresos):
             dia_fecha = inicio_semana + timedelta(days=i)
             dia_str = str(dia_fecha)
-            
-            movs_dia = [m for m in bd["movimientos"] if m.get("fecha") == dia_str]
-            efvo_dia = sum(m.get("monto", 0) for m in movs_dia if m.get("medio") == "EFECTIVO")
-            tarj_dia = sum(m.get("monto", 0) for m in movs_dia if m.get("medio") == "TARJETA / VIRTUAL")
+        
+            ingresos_dia = bd["por_dia"].get(dia_str, {}).get("ingresos", {})
+            efvo_dia = ingresos_dia.get("EFECTIVO", 0)
+            tarj_dia = ingresos_dia.get("TARJETA / VIRTUAL", 0)
             total_dia = efvo_dia + tarj_dia
-            
+        
             total_efectivo_sem += efvo_dia
             total_tarjeta_sem += tarj_dia
 
             if dia_str == hoy_str:
                 ingresos_hoy = total_dia
 
-            tabla_semana_ingresos.rows.append(ft.DataRow(cells=[
-                ft.DataCell(ft.Container(ft.Text(dias_nombres[i]), width=90)),
-                ft.DataCell(ft.Text(f"${efvo_dia:,.2f}")),
-                ft.DataCell(ft.Text(f"${tarj_dia:,.2f}")),
-                ft.DataCell(ft.Text(f"${total_dia:,.2f}", weight="bold"))
-            ]))
-        
+            _poner(txt_efvo, cambiados, value=f"${pesos(efvo_dia):,.2f}")
+            _poner(txt_tarj, cambiados, value=f"${pesos(tarj_dia):,.2f}")
+            _poner(txt_total, cambiados, value=f"${pesos(total_dia):,.2f}")
+    
         total_ingresos_sem = total_efectivo_sem + total_tarjeta_sem
-        tabla_semana_ingresos.rows.append(ft.DataRow(cells=[
-            ft.DataCell(ft.Text("TOTAL SEM", weight="bold")),
-            ft.DataCell(ft.Text(f"${total_efectivo_sem:,.2f}", color="green", weight="bold")),
-            ft.DataCell(ft.Text(f"${total_tarjeta_sem:,.2f}", color="green", weight="bold")),
-            ft.DataCell(ft.Text(f"${total_ingresos_sem:,.2f}", color="blue", weight="bold"))
-        ]))
-
-        tabla_semana_egresos.rows.clear()
-        gastos_semana = [g for g in bd["gastos"] if (inicio_semana <= datetime.strptime(g["fecha"], "%Y-%m-%d").date() <= inicio_semana + timedelta(days=6))]
-        total_gastos_sem = 0
-        egresos_hoy = 0
-        
-        for g in gastos_semana:
-            fecha_formato = datetime.strptime(g["fecha"], "%Y-%m-%d").strftime("%d/%m")
-            detalle_completo = f"[{g.get('categoria', '')}] {g.get('detalle', '')}"
-            monto_gasto = g.get("monto", 0)
-            
-            if g.get("fecha") == hoy_str:
-                egresos_hoy += monto_gasto
-
-            tabla_semana_egresos.rows.append(ft.DataRow(cells=[
-                ft.DataCell(ft.Text(fecha_formato)),
-                ft.DataCell(ft.Text(detalle_completo)),
-                ft.DataCell(ft.Text(f"${monto_gasto:,.2f}", color="red"))
-            ]))
-            total_gastos_sem += monto_gasto
-            
-        tabla_semana_egresos.rows.append(ft.DataRow(cells=[
-            ft.DataCell(ft.Text("TOTAL EGRESOS", weight="bold")),
-            ft.DataCell(ft.Text("")),
-            ft.DataCell(ft.Text(f"${total_gastos_sem:,.2f}", color="red", weight="bold"))
-        ]))
+        _poner(txt_total_efvo_sem, cambiados, value=f"${pesos(total_efectivo_sem):,.2f}")
+        _poner(txt_total_tarj_sem, cambiados, value=f"${pesos(total_tarjeta_sem):,.2f}")
+        _poner(txt_total_ingresos_sem, cambiados, value=f"${pesos(total_ingresos_sem):,.2f}")
+
+        gastos_semana = []
+        for i in range(7):
+            dia_fecha = inicio_semana + timedelta(days=i)
+            gastos_dia = bd["por_dia"].get(str(dia_fecha), {}).get("gastos", {})
+            gastos_semana.extend((clave, (dia_fecha, g)) for clave, g in gastos_dia.items())
+        total_gastos_sem = sum(g.centavos for _, (_, g) in gastos_semana)
+        egresos_hoy = sum(g.centavos for _, (_, g) in gastos_semana if g.fecha == hoy_str)
+
+        sincronizar_controles(tabla_semana_egresos.rows, filas_gastos, gastos_semana, crear_fila_gasto, refrescar_fila_gasto,
+                              cambiados, tabla_semana_egresos, fijos=[fila_total_egresos])
+        _poner(txt_total_egresos_sem, cambiados, value=f"${pesos(total_gastos_sem):,.2f}")
 
         saldo_dia = ingresos_hoy - egresos_hoy
-        txt_ingresos_hoy.value = f"Ingresos Hoy: ${ingresos_hoy:,.2f}"
-        txt_egresos_hoy.value = f"Egresos Hoy: ${egresos_hoy:,.2f}"
-        txt_saldo_dia.value = f"SALDO DEL DÍA (CAJA): ${saldo_dia:,.2f}"
-        txt_saldo_dia.color = "blue_700" if saldo_dia >= 0 else "red_700"
-        
+        _poner(txt_ingresos_hoy, cambiados, value=f"Ingresos Hoy: ${pesos(ingresos_hoy):,.2f}")
+        _poner(txt_egresos_hoy, cambiados, value=f"Egresos Hoy: ${pesos(egresos_hoy):,.2f}")
+        _poner(txt_saldo_dia, cambiados, value=f"SALDO DEL DÍA (CAJA): ${pesos(saldo_dia):,.2f}",
+               color="blue_700" if saldo_dia >= 0 else "red_700")
+    
         saldo_semana = total_ingresos_sem - total_gastos_sem
-        txt_saldo_semana.value = f"SALDO NETO SEMANAL: ${saldo_semana:,.2f}"
+        _poner(txt_saldo_semana, cambiados, value=f"SALDO NETO SEMANAL: ${pesos(saldo_semana):,.2f}")
 
-        mes_actual = hoy_dt.month
-        año_actual = hoy_dt.year
-        mes_anterior = mes_actual - 1 if mes_actual > 1 else 12
-        año_anterior = año_actual if mes_actual > 1 else año_actual - 1
+    def refrescar_estadisticas(cambiados):
+        est = estadisticas(bd, hoy_dt)
+        ingresos_mes_actual = est["mes_actual"]["ingresos"]
 
-        ingresos_mes_actual = sum(m.get("monto", 0) for m in bd["movimientos"] if datetime.strptime(m["fecha"], "%Y-%m-%d").month == mes_actual and datetime.strptime(m["fecha"], "%Y-%m-%d").year == año_actual)
-        ingresos_mes_ant = sum(m.get("monto", 0) for m in bd["movimientos"] if datetime.strptime(m["fecha"], "%Y-%m-%d").month == mes_anterior and datetime.strptime(m["fecha"], "%Y-%m-%d").year == año_anterior)
+        _poner(txt_est_mes_actual, cambiados, value=f"Ingresos Mes Actual: ${pesos(ingresos_mes_actual):,.2f}")
+        _poner(txt_est_mes_anterior, cambiados, value=f"Ingresos Mes Anterior: ${pesos(est['mes_anterior']['ingresos']):,.2f}")
+        mostrar_variacion(txt_est_crecimiento, cambiados, "Evolución", ingresos_mes_actual, est["mes_anterior"]["ingresos"])
 
-        txt_est_mes_actual.value = f"Ingresos Mes Actual: ${ingresos_mes_actual:,.2f}"
-        txt_est_mes_anterior.value = f"Ingresos Mes Anterior: ${ingresos_mes_ant:,.2f}"
-        
-        if ingresos_mes_ant > 0:
-            crecimiento = ((ingresos_mes_actual - ingresos_mes_ant) / ingresos_mes_ant) * 100
-            txt_est_crecimiento.value = f"Evolución: {crecimiento:+.2f}%"
-            txt_est_crecimiento.color = "green" if crecimiento >= 0 else "red"
-        else:
-            txt_est_crecimiento.value = "Evolución: N/A (Faltan datos previos)"
-            txt_est_crecimiento.color = "grey"
+        _poner(txt_est_mes_año_anterior, cambiados, value=f"Mismo Mes del Año Anterior: ${pesos(est['mes_año_anterior']['ingresos']):,.2f}")
+        mostrar_variacion(txt_est_interanual, cambiados, "Interanual", ingresos_mes_actual, est["mes_año_anterior"]["ingresos"])
 
-        lista_facturas_pendientes.controls.clear()
-        facturas = [f for f in bd["facturas_pendientes"] if f.get("estado") == "PENDIENTE"]
-        if not facturas:
-            lista_facturas_pendientes.controls.append(ft.Text("✅ No hay facturas de proveedores pendientes.", color="green"))
-        
-        for f in facturas:
-            try:
-                venc_dt = datetime.strptime(f["vencimiento"], "%d/%m/%Y").date()
-                dias_restantes = (venc_dt - hoy_dt).days
-                
-                if dias_restantes < 0:
-                    estado_txt = f"🔴 VENCIDA (hace {abs(dias_restantes)} días)"
-                    color_bg = "#FFEBEE"
-                elif dias_restantes == 0:
-                    estado_txt = "🔴 VENCE HOY"
-                    color_bg = "#FFEBEE"
-                elif dias_restantes <= 3:
-                    estado_txt = f"🟡 VENCE PRONTO ({dias_restantes} días)"
-                    color_bg = "#FFF3E0"
-                else:
-                    estado_txt = f"🟢 AL DÍA (Vence el {f['vencimiento']})"
-                    color_bg = "#E8F5E9"
-                
-                def marcar_pagado(e, item=f):
-                    item["estado"] = "PAGADO"
-                    guardar_datos(bd)
-                    actualizar_ui()
-                    mostrar_alerta("Factura marcada como pagada.", "green")
-
-                lista_facturas_pendientes.controls.append(
-                    ft.Container(
-                        bgcolor=color_bg, padding=10, border_radius=5,
-                        content=ft.Column([
-                            ft.Text(f"Proveedor: {f.get('proveedor')}", weight="bold"),
-                            ft.Text(f"Monto: ${f.get('monto', 0):,.2f} | {estado_txt}"),
-                            ft.TextButton("✅ Marcar como Pagada", on_click=marcar_pagado)
-                        ])
-                    )
-                )
-            except ValueError:
-                pass
+        _poner(txt_est_año_actual, cambiados, value=f"Ingresos en lo que va del Año: ${pesos(est['año_actual']['ingresos']):,.2f}")
+        mostrar_variacion(txt_est_año_variacion, cambiados, "Contra el Año Anterior a la Fecha", est["año_actual"]["ingresos"], est["ingresos_año_anterior_a_la_fecha"])
 
-        page.update()
+        categorias = sorted(est["mes_actual"]["por_categoria"].items(), key=lambda c: -c[1])
+        sincronizar_controles(lista_gastos_categoria.controls, textos_categoria, categorias, crear_texto_categoria,
+                              refrescar_texto_categoria, cambiados, lista_gastos_categoria, fijos=[txt_sin_categorias])
+        _poner(txt_sin_categorias, cambiados, visible=not categorias)
+
+    def refrescar_proveedores(cambiados):
+        facturas = [(clave, (bd["facturas_pendientes"][clave], venc)) for venc, clave in bd["vencimientos"]]
+        sincronizar_controles(lista_facturas_pendientes.controls, tarjetas_facturas, facturas, crear_tarjeta_factura,
+                              refrescar_tarjeta_factura, cambiados, lista_facturas_pendientes, fijos=[txt_sin_facturas])
+        _poner(txt_sin_facturas, cambiados, visible=not facturas)
+
+    # Filas y tarjetas ya dibujadas, por clave de registro: se reutilizan entre actualizaciones
+    filas_gastos = {}
+    textos_categoria = {}
+    tarjetas_facturas = {}
+
+    def crear_fila_gasto(clave, datos):
+        textos = [ft.Text(), ft.Text(), ft.Text(color="red")]
+        fila = ft.DataRow(cells=[ft.DataCell(t) for t in textos], data=textos)
+        refrescar_fila_gasto(fila, datos, [])
+        return fila
+
+    def refrescar_fila_gasto(fila, datos, cambiados):
+        dia_fecha, g = datos
+        txt_fecha, txt_detalle, txt_monto = fila.data
+        _poner(txt_fecha, cambiados, value=dia_fecha.strftime("%d/%m"))
+        _poner(txt_detalle, cambiados, value=f"[{g.categoria}] {g.detalle}")
+        _poner(txt_monto, cambiados, value=f"${pesos(g.centavos):,.2f}")
+
+    def crear_texto_categoria(categoria, monto):
+        return ft.Text(f"{categoria}: ${pesos(monto):,.2f}", data=categoria)
+
+    def refrescar_texto_categoria(txt, monto, cambiados):
+        _poner(txt, cambiados, value=f"{txt.data}: ${pesos(monto):,.2f}")
+
+    def crear_tarjeta_factura(clave, datos):
+        def marcar_pagado(e):
+            # La factura sale de las pendientes y pasa al archivo, con la fecha de pago como "fecha"
+            with candado:
+                f = bd["facturas_pendientes"].get(clave)
+            if f is None:
+                return
+            registrar_cambios({
+                f"facturas_pendientes/{clave}": None,
+                f"{FACTURAS_PAGADAS}/{clave}": {**f, "estado": "PAGADO", "fecha": hoy_str, "pagado_por": sesion["usuario"]},
+            })
+            actualizar_ui()
+            mostrar_alerta("Factura marcada como pagada.", "green")
+
+        textos = [ft.Text(weight="bold"), ft.Text()]
+        tarjeta = ft.Container(
+            padding=10, border_radius=5, data=textos,
+            content=ft.Column([*textos, ft.TextButton("✅ Marcar como Pagada", on_click=marcar_pagado)])
+        )
+        refrescar_tarjeta_factura(tarjeta, datos, [])
+        return tarjeta
+
+    def refrescar_tarjeta_factura(tarjeta, datos, cambiados):
+        f, venc_dt = datos
+        dias_restantes = (venc_dt - hoy_dt).days
+        if dias_restantes < 0:
+            estado_txt = f"🔴 VENCIDA (hace {abs(dias_restantes)} días)"
+            color_bg = "#FFEBEE"
+        elif dias_restantes == 0:
+            estado_txt = "🔴 VENCE HOY"
+            color_bg = "#FFEBEE"
+        elif dias_restantes <= DIAS_AVISO_VENCIMIENTO:
+            estado_txt = f"🟡 VENCE PRONTO ({dias_restantes} días)"
+            color_bg = "#FFF3E0"
+        else:
+            estado_txt = f"🟢 AL DÍA (Vence el {f['vencimiento']})"
+            color_bg = "#E8F5E9"
+        txt_proveedor, txt_detalle = tarjeta.data
+        _poner(tarjeta, cambiados, bgcolor=color_bg)
+        _poner(txt_proveedor, cambiados, value=f"Proveedor: {f.get('proveedor')}")
+        _poner(txt_detalle, cambiados, value=f"Monto: ${f.get('monto', 0):,.2f} | {estado_txt}")
 
     def forzar_sincronizacion(e):
-        nonlocal bd
-        bd = cargar_datos()
-        actualizar_ui()
-        mostrar_alerta("Base de datos actualizada correctamente con la nube.", "blue")
+        reconciliador.sincronizar_ahora(traer=True)
+        mostrar_alerta("Sincronizando con la nube en segundo plano...", "blue")
+
+    def al_recibir_cambios(mensaje):
+        # Los cambios ya están aplicados en la bd compartida: solo hace falta redibujar,
+        # y los cierres y los archivos (facturas pagadas, filas de meses cerrados) no se muestran en ninguna vista
+        if sesion["usuario"] and mensaje["colecciones"] & (set(COLECCIONES) - {"cierres"}):
+            actualizar_ui()
+        if FACTURAS_PAGADAS in mensaje["colecciones"] and contenedor_archivo.visible:
+            mostrar_archivo()
+
+    def mostrar_estado_sync(estado):
+        if estado["error"]:
+            txt_estado_sync.value = f"⚠️ {estado['error']} | {estado['pendientes']} pendientes"
+            txt_estado_sync.color = "red_700"
+        elif estado["pendientes"]:
+            txt_estado_sync.value = f"⏳ {estado['pendientes']} cambios por subir"
+            txt_estado_sync.color = "orange_700"
+        else:
+            txt_estado_sync.value = "☁️ Sincronizado"
+            txt_estado_sync.color = "green_700"
+        if sesion["usuario"]:
+            page.update(txt_estado_sync)
+
+    def al_cerrar_sesion(e):
+        # Si la carga falló o no terminó, la sesión nunca se registró
+        if not datos_listos.wait(ESPERA_DATOS) or carga["error"]:
+            return
+        registrar_sesion(page.session_id, None)
+        page.pubsub.unsubscribe_all()
+        reconciliador.oyentes_estado.remove(mostrar_estado_sync)
+
+    def preparar_datos():
+        # La primera sesión del proceso carga la copia local; las siguientes encuentran todo listo
+        nonlocal servicios, almacen, reconciliador, bd, candado
+        # Pase lo que pase el evento se libera: el login nunca queda esperando una carga que falló
+        inicio = time.perf_counter()
+        try:
+            servicios = iniciar_servicios()
+            almacen, reconciliador = servicios["almacen"], servicios["reconciliador"]
+            bd, candado = servicios["bd"], servicios["candado"]
+            page.pubsub.subscribe(al_recibir_cambios)
+            registrar_sesion(page.session_id, page.pubsub)
+            reconciliador.oyentes_estado.append(mostrar_estado_sync)
+            mostrar_estado_sync(reconciliador.estado)
+            carga["error"] = None
+            txt_error_carga.visible = False
+            METRICAS.registrar("inicio.datos_ms", (time.perf_counter() - inicio) * 1000)
+        except Exception as e:
+            carga["error"] = str(e) or type(e).__name__
+            print(f"Error: No se pudieron cargar los datos. {e}")
+            txt_error_carga.value = f"⚠️ No se pudieron cargar los datos ({carga['error']}). Tocá Iniciar Sesión para reintentar."
+            txt_error_carga.visible = True
+            page.update(txt_error_carga)
+        finally:
+            datos_listos.set()
+
+    page.on_close = al_cerrar_sesion
 
     btn_actualizar = ft.ElevatedButton("🔄 Actualizar Base de Datos", on_click=forzar_sincronizacion, bgcolor="blue_grey_50")
 
+    def registrar_cambios(cambios):
+        # Primero la copia local (memoria + disco), la nube la alcanza el reconciliador
+        with candado, METRICAS.medir("local.guardado_ms"):
+            registros = aplicar_cambios(bd, cambios)
+            almacen.guardar(registros, cambios)
+        reconciliador.sincronizar_ahora()
+        page.pubsub.send_others({"colecciones": {c for c, _ in registros}})
+
+    def agregar_registro(coleccion, registro):
+        registrar_cambios({ruta_registro(coleccion, nueva_clave(), registro): registro})
+
     def procesar_cierre_diario(e):
-        bd["cierres"].append({
+        agregar_registro("cierres", {
             "fecha": hoy_str,
             "hora_cierre": datetime.now().strftime('%H:%M'),
             "cerrado_por": sesion["usuario"],
@@ -247,26 +812,27 @@ def main(page: ft.Page):
             "egresos_dia": txt_egresos_hoy.value,
             "saldo_dia": txt_saldo_dia.value
         })
-        guardar_datos(bd)
+        page.run_thread(compactar_en_segundo_plano, sesion["usuario"])
         mostrar_alerta("Día cerrado y guardado correctamente en la base de datos.", "green")
         
     btn_cierre_dia = ft.ElevatedButton("🔒 REALIZAR CIERRE DIARIO", on_click=procesar_cierre_diario, bgcolor="black", color="white", width=300)
 
     def revisar_alertas_emergentes():
-        facturas_criticas = []
-        for f in bd["facturas_pendientes"]:
-            if f.get("estado") == "PENDIENTE":
-                try:
-                    venc_dt = datetime.strptime(f["vencimiento"], "%d/%m/%Y").date()
-                    if venc_dt <= hoy_dt: 
-                        facturas_criticas.append(f)
-                except ValueError:
-                    pass
-        
-        if facturas_criticas:
-            contenido_alerta = ft.Column([ft.Text("¡Atención! Las siguientes facturas requieren pago inmediato:", weight="bold")])
+        with candado:
+            por_vencer = list(facturas_por_vencer(bd, hoy_dt + timedelta(days=DIAS_AVISO_VENCIMIENTO)))
+        facturas_criticas = [f for _, f, venc in por_vencer if venc <= hoy_dt]
+        facturas_proximas = [f for _, f, venc in por_vencer if venc > hoy_dt]
+
+        if facturas_criticas or facturas_proximas:
+            contenido_alerta = ft.Column([])
+            if facturas_criticas:
+                contenido_alerta.controls.append(ft.Text("¡Atención! Las siguientes facturas requieren pago inmediato:", weight="bold"))
             for fc in facturas_criticas:
                 contenido_alerta.controls.append(ft.Text(f"- {fc['proveedor']} por ${fc['monto']:,.2f} (Venc: {fc['vencimiento']})", color="red"))
+            if facturas_proximas:
+                contenido_alerta.controls.append(ft.Text(f"Vencen en los próximos {DIAS_AVISO_VENCIMIENTO} días:", weight="bold"))
+            for fc in facturas_proximas:
+                contenido_alerta.controls.append(ft.Text(f"- {fc['proveedor']} por ${fc['monto']:,.2f} (Venc: {fc['vencimiento']})", color="orange_700"))
             
             dlg_alerta = ft.AlertDialog(
                 title=ft.Text("⚠️ AVISO DE VENCIMIENTOS", color="red"),
@@ -279,33 +845,94 @@ def main(page: ft.Page):
 
     def cerrar_alerta(dialogo):
         dialogo.open = False
-        page.update()
+        page.update(dialogo)
 
     # --- FORMULARIOS DE CARGA ---
     inp_venta_monto = ft.TextField(label="Monto Ingreso ($)", keyboard_type="number", border_color="green")
-    sel_venta_medio = ft.Dropdown(options=[ft.dropdown.Option("EFECTIVO"), ft.dropdown.Option("TARJETA / VIRTUAL")], value="EFECTIVO")
+    sel_venta_medio = ft.Dropdown(options=[ft.dropdown.Option(m) for m in MEDIOS], value="EFECTIVO")
     
     def registrar_venta(e):
         if not inp_venta_monto.value: return mostrar_alerta("Ingresá un monto.")
         try:
-            monto = float(inp_venta_monto.value)
-            bd["movimientos"].append({
+            monto = _leer_monto(inp_venta_monto.value)
+            if monto is None:
+                raise ValueError(inp_venta_monto.value)
+            agregar_registro("movimientos", {
                 "fecha": hoy_str, "usuario": sesion["usuario"],
                 "monto": monto, "medio": sel_venta_medio.value
             })
-            guardar_datos(bd)
             inp_venta_monto.value = ""
             actualizar_ui()
-            mostrar_alerta("Ingreso registrado en la planilla.", "green")
+            mostrar_alerta("Ingreso registrado en la planilla.", "green", inp_venta_monto)
         except ValueError: mostrar_alerta("Monto inválido.")
 
+    # Carga por lote: las ventas se escriben o pegan de a una por línea, se ven como provisorias
+    # y se confirman juntas (una sola escritura, una sola subida a la nube y un solo redibujo)
+    inp_lote = ft.TextField(
+        label="Ventas del lote (una por línea: monto y medio, ej: 1500 t)", multiline=True, min_lines=4, max_lines=10,
+        border_color="green", on_change=lambda e: mostrar_lote(),
+    )
+    lista_lote = ft.Column(spacing=2)
+    txt_resumen_lote = ft.Text(weight="bold")
+    btn_confirmar_lote = ft.ElevatedButton("✅ Confirmar Lote", on_click=lambda e: confirmar_lote(), bgcolor="green",
+                                           color="white", disabled=True)
+
+    # Se confirman exactamente las filas de la última vista previa, no una nueva lectura del texto
+    lote = {"filas": []}
+
+    def mostrar_lote():
+        filas = lote["filas"] = leer_lote(inp_lote.value or "", sel_venta_medio.value)
+        errores = [f for f in filas if f[3]]
+        lista_lote.controls = [
+            ft.Text(f"✖ Línea {numero}: {error}", color="red") if error else
+            ft.Text(f"{numero}. ${monto:,.2f} - {medio} (provisoria)", italic=True, color="grey_700")
+            for numero, monto, medio, error in filas
+        ]
+        total = sum(monto for _, monto, _, error in filas if not error)
+        txt_resumen_lote.value = (f"{len(filas) - len(errores)} ventas por ${total:,.2f}"
+                                  + (f" | Corregí {len(errores)} línea(s) marcada(s)" if errores else ""))
+        txt_resumen_lote.color = "red" if errores else "green_700"
+        btn_confirmar_lote.disabled = bool(errores) or not filas
+        page.update(lista_lote, txt_resumen_lote, btn_confirmar_lote)
+
+    def confirmar_lote():
+        filas = lote["filas"]
+        if not filas or any(f[3] for f in filas):
+            return mostrar_lote()
+        cambios = {}
+        for _, monto, medio, _ in filas:
+            registro = {"fecha": hoy_str, "usuario": sesion["usuario"], "monto": monto, "medio": medio}
+            cambios[ruta_registro("movimientos", nueva_clave(), registro)] = registro
+        registrar_cambios(cambios)
+        METRICAS.registrar("ui.ventas_por_lote", len(cambios))
+        inp_lote.value = ""
+        lote["filas"] = []
+        lista_lote.controls = []
+        txt_resumen_lote.value = ""
+        btn_confirmar_lote.disabled = True
+        page.update(inp_lote, lista_lote, txt_resumen_lote, btn_confirmar_lote)
+        actualizar_ui()
+        mostrar_alerta(f"{len(cambios)} ingresos registrados en la planilla.", "green")
+
+    contenedor_lote = ft.Column([
+        inp_lote, lista_lote,
+        ft.Row([txt_resumen_lote, btn_confirmar_lote], alignment="spaceBetween"),
+    ], visible=False)
+
+    def al_cambiar_medio(e):
+        # El medio elegido vale para las líneas sin medio: la vista previa se rehace con él
+        if contenedor_lote.visible and inp_lote.value:
+            mostrar_lote()
+
+    sel_venta_medio.on_change = al_cambiar_medio
+
+    def abrir_lote(e):
+        contenedor_lote.visible = not contenedor_lote.visible
+        page.update(contenedor_lote)
+
     sel_gasto_cat = ft.Dropdown(
         label="Categoría de Salida", 
-        options=[
-            ft.dropdown.Option("Pago a Proveedor"), 
-            ft.dropdown.Option("Gasto Vario"), 
-            ft.dropdown.Option("Retiro de Caja")
-        ], 
+        options=[ft.dropdown.Option(c) for c in CATEGORIAS], 
         value="Pago a Proveedor"
     )
     inp_gasto_detalle = ft.TextField(label="Detalle Opcional (Ej: Filtros Mann / Retiro Sergio)", border_color="red")
@@ -314,15 +941,16 @@ def main(page: ft.Page):
     def registrar_gasto(e):
         if not inp_gasto_monto.value: return mostrar_alerta("El monto es obligatorio.")
         try:
-            monto = float(inp_gasto_monto.value)
-            bd["gastos"].append({
+            monto = _leer_monto(inp_gasto_monto.value)
+            if monto is None:
+                raise ValueError(inp_gasto_monto.value)
+            agregar_registro("gastos", {
                 "fecha": hoy_str, "usuario": sesion["usuario"],
                 "categoria": sel_gasto_cat.value, "detalle": inp_gasto_detalle.value, "monto": monto
             })
-            guardar_datos(bd)
             inp_gasto_detalle.value = ""; inp_gasto_monto.value = ""
             actualizar_ui()
-            mostrar_alerta("Egreso/Retiro registrado.", "orange")
+            mostrar_alerta("Egreso/Retiro registrado.", "orange", inp_gasto_detalle, inp_gasto_monto)
         except ValueError: mostrar_alerta("Monto inválido.")
 
     inp_fac_proveedor = ft.TextField(label="Nombre del Proveedor")
@@ -333,24 +961,135 @@ def main(page: ft.Page):
         if not inp_fac_monto.value or not inp_fac_venc.value or not inp_fac_proveedor.value: 
             return mostrar_alerta("Todos los campos son obligatorios.")
         try:
-            monto = float(inp_fac_monto.value)
+            monto = _leer_monto(inp_fac_monto.value)
+            if monto is None:
+                raise ValueError(inp_fac_monto.value)
             datetime.strptime(inp_fac_venc.value, "%d/%m/%Y")
-            if "facturas_pendientes" not in bd: bd["facturas_pendientes"] = []
-            bd["facturas_pendientes"].append({
+            agregar_registro("facturas_pendientes", {
                 "proveedor": inp_fac_proveedor.value, "monto": monto, 
                 "vencimiento": inp_fac_venc.value, "estado": "PENDIENTE",
                 "cargado_por": sesion["usuario"]
             })
-            guardar_datos(bd)
             inp_fac_proveedor.value = ""; inp_fac_monto.value = ""; inp_fac_venc.value = ""
             actualizar_ui()
-            mostrar_alerta("Factura guardada para futuras alertas.", "blue")
+            mostrar_alerta("Factura guardada para futuras alertas.", "blue", inp_fac_proveedor, inp_fac_monto, inp_fac_venc)
         except ValueError: mostrar_alerta("Revisá que el monto sea número y la fecha DD/MM/YYYY.")
 
+    # --- EXPORTACIÓN A EXCEL ---
+    inp_exp_desde = ft.TextField(label="Desde (DD/MM/YYYY)", value=hoy_dt.replace(day=1).strftime("%d/%m/%Y"))
+    inp_exp_hasta = ft.TextField(label="Hasta (DD/MM/YYYY)", value=hoy_dt.strftime("%d/%m/%Y"))
+    barra_exportacion = ft.ProgressBar(value=0, visible=False)
+    txt_exportacion = ft.Text("", size=12, color="grey")
+
+    def exportar(e):
+        try:
+            desde = datetime.strptime(inp_exp_desde.value, "%d/%m/%Y").date()
+            hasta = datetime.strptime(inp_exp_hasta.value, "%d/%m/%Y").date()
+        except ValueError:
+            return mostrar_alerta("Revisá que las fechas sean DD/MM/YYYY.")
+        if desde > hasta: return mostrar_alerta("La fecha 'Desde' no puede ser posterior a 'Hasta'.")
+
+        btn_exportar.disabled = True
+        barra_exportacion.value = 0
+        barra_exportacion.visible = True
+        txt_exportacion.value = "Generando planilla..."
+        page.update(btn_exportar, barra_exportacion, txt_exportacion)
+        page.run_thread(generar_exportacion, desde, hasta)
+
+    def generar_exportacion(desde, hasta):
+        def avanzar(fraccion):
+            barra_exportacion.value = fraccion
+            page.update(barra_exportacion)
+
+        nombre = nueva_exportacion(desde, hasta)
+        try:
+            exportar_excel(os.path.join(DIR_EXPORTACIONES, nombre), leer_particion, desde, hasta, avanzar)
+            txt_exportacion.value = f"Listo: {nombre}"
+            page.launch_url(f"/exportaciones/{nombre}")
+        except Exception as ex:
+            print(f"Error al exportar a Excel: {ex}")
+            txt_exportacion.value = f"No se pudo generar la planilla: {ex}"
+        btn_exportar.disabled = False
+        barra_exportacion.visible = False
+        page.update(btn_exportar, barra_exportacion, txt_exportacion)
+
+    btn_exportar = ft.ElevatedButton("📥 Descargar Excel", on_click=exportar, bgcolor="blue", color="white")
+
+    # --- ARCHIVO DE FACTURAS PAGADAS ---
+    # Se lee de a una página desde el disco y recién la primera vez que alguien lo abre
+    # se pide a la nube el archivo completo, en segundo plano
+    archivo = {"pagina": 0, "pedido": False}
+    inp_buscar_proveedor = ft.TextField(label="Buscar Proveedor", on_change=lambda e: buscar_en_archivo())
+    lista_archivo = ft.Column(spacing=5)
+    txt_pagina_archivo = ft.Text("", size=12, color="grey")
+    btn_archivo_anterior = ft.TextButton("◀ Anterior", on_click=lambda e: cambiar_pagina_archivo(-1))
+    btn_archivo_siguiente = ft.TextButton("Siguiente ▶", on_click=lambda e: cambiar_pagina_archivo(1))
+    contenedor_archivo = ft.Column([
+        inp_buscar_proveedor, lista_archivo,
+        ft.Row([btn_archivo_anterior, txt_pagina_archivo, btn_archivo_siguiente], alignment="center")
+    ], visible=False)
+
+    def mostrar_archivo():
+        facturas, total = almacen.buscar(FACTURAS_PAGADAS, inp_buscar_proveedor.value or "",
+                                         desde=archivo["pagina"] * FACTURAS_POR_PAGINA, cantidad=FACTURAS_POR_PAGINA)
+        lista_archivo.controls = [
+            ft.Text(f"{date.fromisoformat(f['fecha']).strftime('%d/%m/%Y')} - {f.get('proveedor')} - ${f.get('monto', 0):,.2f} "
+                    f"(Venc: {f.get('vencimiento')}, pagó {f.get('pagado_por') or '-'})")
+            for _, f in facturas
+        ] or [ft.Text("No hay facturas pagadas que coincidan.", color="grey")]
+        paginas = max(1, -(-total // FACTURAS_POR_PAGINA))
+        txt_pagina_archivo.value = f"Página {archivo['pagina'] + 1} de {paginas} ({total} facturas)"
+        btn_archivo_anterior.disabled = archivo["pagina"] == 0
+        btn_archivo_siguiente.disabled = archivo["pagina"] + 1 >= paginas
+        page.update(lista_archivo, txt_pagina_archivo, btn_archivo_anterior, btn_archivo_siguiente)
+
+    def buscar_en_archivo():
+        archivo["pagina"] = 0
+        mostrar_archivo()
+
+    def cambiar_pagina_archivo(paso):
+        archivo["pagina"] = max(0, archivo["pagina"] + paso)
+        mostrar_archivo()
+
+    def abrir_archivo(e):
+        if not archivo["pedido"]:
+            archivo["pedido"] = True
+            reconciliador.pedir_particiones([(FACTURAS_PAGADAS, None)])
+        contenedor_archivo.visible = not contenedor_archivo.visible
+        page.update(contenedor_archivo)
+        if contenedor_archivo.visible:
+            mostrar_archivo()
+
+    # --- MÉTRICAS DEL SISTEMA ---
+    tabla_metricas = ft.DataTable(
+        columns=[
+            ft.DataColumn(ft.Text("MÉTRICA", weight="bold")),
+            ft.DataColumn(ft.Text("N", weight="bold"), numeric=True),
+            ft.DataColumn(ft.Text("P50", weight="bold"), numeric=True),
+            ft.DataColumn(ft.Text("P95", weight="bold"), numeric=True),
+            ft.DataColumn(ft.Text("MÁX", weight="bold"), numeric=True),
+        ],
+        rows=[], heading_row_color="#ECEFF1", column_spacing=15
+    )
+    txt_metricas_contadores = ft.Text("", size=14, selectable=True)
+
+    def mostrar_metricas(e=None):
+        # Vista de administración: se arma solo al entrar o al refrescar, nunca en cada actualizar_ui
+        resumen = METRICAS.resumen()
+        tabla_metricas.rows = [
+            ft.DataRow(cells=[ft.DataCell(ft.Text(nombre)), ft.DataCell(ft.Text(str(p["n"]))),
+                              *[ft.DataCell(ft.Text(f"{p[k]:,.1f}")) for k in ("p50", "p95", "max")]])
+            for nombre, p in sorted(resumen["percentiles"].items())
+        ]
+        contadores = {**resumen["contadores"], **resumen["valores"]}
+        txt_metricas_contadores.value = "\n".join(f"{nombre}: {valor}" for nombre, valor in sorted(contadores.items())) or "Sin eventos todavía."
+        if e is not None:
+            page.update(tabla_metricas, txt_metricas_contadores)
+
     # --- VISTAS PRINCIPALES ---
     # Se quitó el atributo scroll="always" de las columnas de vista para evitar el choque con page.scroll
     vista_planilla = ft.Column([
-        ft.Row([txt_info_sesion, btn_actualizar], alignment="spaceBetween"), ft.Divider(),
+        ft.Row([txt_info_sesion, txt_estado_sync, btn_actualizar], alignment="spaceBetween"), ft.Divider(),
         
         ft.Container(
             content=ft.Column([
@@ -367,7 +1106,11 @@ def main(page: ft.Page):
         ft.Text("Registro de Caja / Mostrador", size=18, weight="bold"),
         ft.Card(ft.Container(padding=10, content=ft.Column([
             ft.Row([inp_venta_monto, sel_venta_medio]),
-            ft.ElevatedButton("➕ Agregar Ingreso", on_click=registrar_venta, bgcolor="green", color="white"),
+            ft.Row([
+                ft.ElevatedButton("➕ Agregar Ingreso", on_click=registrar_venta, bgcolor="green", color="white"),
+                ft.TextButton("⚡ Carga por Lote", on_click=abrir_lote),
+            ]),
+            contenedor_lote,
             ft.Divider(),
             sel_gasto_cat,
             ft.Row([inp_gasto_detalle, inp_gasto_monto]),
@@ -387,7 +1130,18 @@ def main(page: ft.Page):
         ft.Card(ft.Container(padding=20, content=ft.Column([
             txt_est_mes_actual, txt_est_mes_anterior, ft.Divider(), txt_est_crecimiento
         ]))),
-        ft.Text("Nota: Se irán sumando comparativas anuales a medida que se acumulen datos.", size=12, color="grey")
+        ft.Card(ft.Container(padding=20, content=ft.Column([
+            txt_est_mes_año_anterior, txt_est_interanual, ft.Divider(), txt_est_año_actual, txt_est_año_variacion
+        ]))),
+        ft.Text("Egresos del Mes por Categoría", size=18, weight="bold", color="red_700"),
+        ft.Card(ft.Container(padding=20, content=lista_gastos_categoria)),
+        ft.Text("Nota: Las comparativas anuales se completan a medida que se acumulan datos.", size=12, color="grey"),
+        ft.Divider(),
+        ft.Text("Exportar a Excel (para el contador)", size=18, weight="bold", color="blue_900"),
+        ft.Card(ft.Container(padding=20, content=ft.Column([
+            ft.Row([inp_exp_desde, inp_exp_hasta]),
+            btn_exportar, barra_exportacion, txt_exportacion
+        ])))
     ], visible=False)
 
     vista_proveedores = ft.Column([
@@ -399,56 +1153,62 @@ def main(page: ft.Page):
         ft.ElevatedButton("Guardar Factura", on_click=registrar_factura, bgcolor="blue", color="white"),
         ft.Divider(),
         ft.Text("Facturas Pendientes de Pago", weight="bold"),
-        lista_facturas_pendientes
+        lista_facturas_pendientes,
+        ft.Divider(),
+        ft.Text("Archivo de Facturas Pagadas", weight="bold"),
+        ft.ElevatedButton("📂 Ver / Ocultar Archivo", on_click=abrir_archivo),
+        contenedor_archivo
+    ], visible=False)
+
+    vista_sistema = ft.Column([
+        ft.Text("Rendimiento del Sistema", size=22, weight="bold", color="blue_grey_900"),
+        ft.Text("Últimas muestras de cada operación (ms o bytes según el nombre).", size=12, color="grey"),
+        ft.Divider(),
+        ft.Row([tabla_metricas], scroll="auto"),
+        ft.Text("Contadores", size=18, weight="bold"),
+        txt_metricas_contadores,
+        ft.ElevatedButton("🔄 Refrescar Métricas", on_click=mostrar_metricas)
     ], visible=False)
 
     # --- NAVEGACIÓN ---
     barra_navegacion = ft.Row([
         ft.ElevatedButton("📊 Planilla", on_click=lambda _: cambiar_vista(0), expand=True),
         ft.ElevatedButton("📈 Estadísticas", on_click=lambda _: cambiar_vista(1), expand=True),
-        ft.ElevatedButton("🚚 Proveedores", on_click=lambda _: cambiar_vista(2), expand=True)
+        ft.ElevatedButton("🚚 Proveedores", on_click=lambda _: cambiar_vista(2), expand=True),
+        ft.ElevatedButton("🛠️ Sistema", on_click=lambda _: cambiar_vista(3), expand=True)
     ], visible=False)
 
-    def cambiar_vista(indice):
-        vista_planilla.visible = (indice == 0)
-        vista_estadisticas.visible = (indice == 1)
-        vista_proveedores.visible = (indice == 2)
-        page.update()
+    # Las vistas se montan en la página recién la primera vez que se abren:
+    # el login no espera a armar (ni a mandar al navegador) planillas, estadísticas y proveedores
+    vistas = [vista_planilla, vista_estadisticas, vista_proveedores, vista_sistema]
+    vistas_montadas = set()
+    contenedor_vistas = ft.Column()
 
-    # --- PANTALLA DE LOGIN ---
-    sel_usuario = ft.Dropdown(label="Seleccionar Usuario", options=[
-        ft.dropdown.Option("Mamá"), ft.dropdown.Option("Julián"), ft.dropdown.Option("Sergio")
-    ], width=300)
-    
-    inp_clave = ft.TextField(label="Clave de Acceso", password=True, can_reveal_password=True, width=300)
-    
-    def loguear(e):
-        if not sel_usuario.value: return mostrar_alerta("Elegí un usuario.")
-        if inp_clave.value != "181214": return mostrar_alerta("Clave incorrecta.")
-        
-        sesion["usuario"] = sel_usuario.value
-        
-        pantalla_login.visible = False
-        barra_navegacion.visible = True
-        vista_planilla.visible = True
-        
-        actualizar_ui()
-        revisar_alertas_emergentes() 
+    def mostrar_vista(indice):
+        # Devuelve True si la vista se montó ahora
+        for i, vista in enumerate(vistas):
+            vista.visible = (i == indice)
+        if indice in vistas_montadas:
+            return False
+        vistas_montadas.add(indice)
+        contenedor_vistas.controls.append(vistas[indice])
+        return True
 
-    btn_entrar = ft.ElevatedButton("Iniciar Sesión", on_click=loguear, width=300, bgcolor="blue_900", color="white")
-
-    pantalla_login = ft.Column([
-        ft.Text("REPUESTERA HAFID", size=30, weight="bold", color="blue_900"), 
-        ft.Text("Sistema de Gestión y Planilla Diaria", size=16, color="grey"),
-        ft.Divider(),
-        sel_usuario,
-        inp_clave,
-        ft.Container(height=10),
-        btn_entrar
-    ], horizontal_alignment=ft.CrossAxisAlignment.CENTER)
+    def cambiar_vista(indice):
+        inicio = time.perf_counter()
+        montada = mostrar_vista(indice)
+        if indice == 1:
+            asegurar_meses(meses_estadisticas(bd, hoy_dt))
+        if indice == 3:
+            mostrar_metricas()
+        refrescar_controles()
+        page.update()
+        if montada:
+            METRICAS.registrar("inicio.montar_vista_ms", (time.perf_counter() - inicio) * 1000)
 
-    page.add(pantalla_login, barra_navegacion, ft.Divider(), vista_planilla, vista_estadisticas, vista_proveedores)
+    page.add(barra_navegacion, ft.Divider(), contenedor_vistas)
+    page.run_thread(preparar_datos)
 
 if __name__ == "__main__":
     puerto = int(os.environ.get("PORT", 8080))
-    ft.app(target=main, view=ft.AppView.WEB_BROWSER, port=puerto, host="0.0.0.0")
\ No newline at end of file
+    ft.app(target=main, view=ft.AppView.WEB_BROWSER, port=puerto, host="0.0.0.0", assets_dir=DIR_ASSETS)
\ No newline at end of file
@@ -0,0 +1,234 @@
+"""Benchmarks de carga, sincronización y redibujo con historiales sintéticos.
+
+Levanta un Firebase local (firebase_local.py) con latencia configurable, genera varios
+años de movimientos, gastos, facturas y cierres, y maneja los handlers de main() sin
+navegador. Informa latencia (p50/p95) y pico de memoria por operación y tamaño:
+
+    python benchmark.py --tamaños 5000,50000,500000 --latencia 0.05
+    python benchmark.py --json resultados.json
+    python benchmark.py --formato anterior     # la nube con filas en el formato previo a registros.py
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+import requests
+
+import app_prueba
+import firebase_local
+import sincronizacion
+from almacen_local import AlmacenLocal
+from metricas import METRICAS
+from pagina_simulada import PaginaSimulada
+from registros import CATEGORIAS, USUARIOS, codificar, decodificar
+from sincronizacion import FACTURAS_PAGADAS, alcance, meses_hasta, particion
+
+PROVEEDORES = ["Filtros Mann", "Bosch", "SKF", "Wega", "Fram", "Corven", "Monroe"]
+
+
+# --- HISTORIAL SINTÉTICO ---
+def generar_historia(movimientos, años=3, hoy=None, semilla=1, compacto=True):
+    # Devuelve el árbol de caja_repuestos con el esquema particionado, terminando hoy.
+    # Sin compacto, los movimientos y gastos quedan como antes de migrar_compacto.py
+    azar = random.Random(semilla)
+    hoy = hoy or date.today()
+    dias = [hoy - timedelta(days=i) for i in range(365 * años)]
+    dias = sorted(d for d in dias if d.weekday() < 6)
+    por_dia = max(1, movimientos // len(dias))
+    arbol = {"movimientos": {}, "gastos": {}, "facturas_pendientes": {}, "cierres": {}, FACTURAS_PAGADAS: {}}
+    n = 0
+
+    def agregar(coleccion, registro):
+        nonlocal n
+        n += 1
+        clave = f"b{n:08d}"
+        mes = particion(coleccion, registro)
+        destino = arbol[coleccion].setdefault(mes, {}) if mes else arbol[coleccion]
+        destino[clave] = codificar(coleccion, registro) if compacto else registro
+
+    for dia in dias:
+        fecha = str(dia)
+        for _ in range(por_dia):
+            agregar("movimientos", {
+                "fecha": fecha, "usuario": azar.choice(USUARIOS),
+                "monto": round(azar.lognormvariate(9, 1), 2),
+                "medio": "EFECTIVO" if azar.random() < 0.6 else "TARJETA / VIRTUAL",
+            })
+        for _ in range(max(1, por_dia // 10)):
+            agregar("gastos", {
+                "fecha": fecha, "usuario": azar.choice(USUARIOS), "categoria": azar.choice(CATEGORIAS),
+                "detalle": azar.choice(PROVEEDORES), "monto": round(azar.lognormvariate(10, 1), 2),
+            })
+        if dia.weekday() in (0, 3):
+            vencimiento = dia + timedelta(days=azar.randint(7, 45))
+            factura = {
+                "proveedor": azar.choice(PROVEEDORES), "monto": round(azar.lognormvariate(11, 0.7), 2),
+                "vencimiento": vencimiento.strftime("%d/%m/%Y"), "estado": "PENDIENTE",
+                "cargado_por": azar.choice(USUARIOS),
+            }
+            if vencimiento < hoy - timedelta(days=3):
+                factura.update(estado="PAGADO", fecha=str(vencimiento), pagado_por=azar.choice(USUARIOS))
+                agregar(FACTURAS_PAGADAS, factura)
+            else:
+                agregar("facturas_pendientes", factura)
+        agregar("cierres", {
+            "fecha": fecha, "hora_cierre": "19:30", "cerrado_por": azar.choice(USUARIOS),
+            "ingresos_dia": "", "egresos_dia": "", "saldo_dia": "",
+        })
+    return arbol
+
+
+def sembrar_almacen(almacen, arbol):
+    # La copia local de un equipo que ya viene usando la app: todo el historial en disco
+    registros = {}
+    for coleccion, contenido in arbol.items():
+        if coleccion in sincronizacion.COLECCIONES_POR_MES:
+            for datos in contenido.values():
+                registros.update({(coleccion, clave): decodificar(coleccion, r) for clave, r in datos.items()})
+        else:
+            registros.update({(coleccion, clave): r for clave, r in contenido.items()})
+    with almacen.lock, almacen.conexion:
+        almacen._escribir(registros)
+
+
+# --- MEDICIÓN ---
+def medir(operacion, repeticiones, preparar=None):
+    tiempos, picos = [], []
+    for _ in range(repeticiones):
+        if preparar:
+            preparar()
+        tracemalloc.start()
+        inicio = time.perf_counter()
+        operacion()
+        tiempos.append(time.perf_counter() - inicio)
+        picos.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    tiempos.sort()
+    return {
+        "p50_ms": statistics.median(tiempos) * 1000,
+        "p95_ms": tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.95))] * 1000,
+        "memoria_pico_kb": max(picos) / 1024,
+    }
+
+
+def correr_tamaño(movimientos, latencia, repeticiones, directorio, compacto=True):
+    arbol = generar_historia(movimientos, compacto=compacto)
+    servidor, url = firebase_local.iniciar_servidor({"caja_repuestos": arbol}, latencia=latencia)
+    sincronizacion.FIREBASE_URL = f"{url}/caja_repuestos"
+    almacen = AlmacenLocal(os.path.join(directorio, f"bench_{movimientos}.db"))
+    sembrar_almacen(almacen, arbol)
+
+    app_prueba._servicios.clear()
+    METRICAS.reiniciar()
+    servicios = app_prueba.iniciar_servicios(almacen, en_segundo_plano=False)
+    reconciliador = servicios["reconciliador"]
+    pagina = PaginaSimulada({})
+    app_prueba.main(pagina)
+    pagina.iniciar_sesion()
+    hoy = date.today()
+    resultados = {}
+    # Fases del arranque, tal como las registra la app (la carga local ya se hizo en iniciar_servicios)
+    for nombre, fase in (("inicio: login dibujado", "inicio.login_ms"), ("inicio: carga local de datos", "local.carga_ms"),
+                         ("inicio: login -> planilla", "inicio.planilla_ms")):
+        p = METRICAS.resumen()["percentiles"][fase]
+        resultados[nombre] = {"p50_ms": p["p50"], "p95_ms": p["p95"], "memoria_pico_kb": float("nan")}
+
+    resultados["cargar_datos (local, meses en uso)"] = medir(lambda: app_prueba.cargar_datos(almacen), repeticiones)
+    en_uso = alcance(meses_hasta(hoy, sincronizacion.MESES_EN_VIVO))
+
+    def olvidar_etags():
+        with almacen.lock, almacen.conexion:
+            almacen.conexion.execute("DELETE FROM etags")
+
+    bajados = servidor.bytes_enviados
+    resultados["traer de la nube (meses en uso)"] = medir(lambda: reconciliador.traer(en_uso), repeticiones, preparar=olvidar_etags)
+    resultados["traer de la nube (meses en uso)"]["bytes_por_bajada"] = (servidor.bytes_enviados - bajados) / repeticiones
+    bajados = servidor.bytes_enviados
+    # Firebase no responde 304: los bytes se bajan igual, lo que se ahorra es parsear y fusionar
+    resultados["traer sin cambios (ETag)"] = medir(lambda: reconciliador.traer(en_uso), repeticiones)
+    resultados["traer sin cambios (ETag)"]["bytes_por_bajada"] = (servidor.bytes_enviados - bajados) / repeticiones
+
+    def cargar_historial():
+        servicios["bd"]["meses"] = set(meses_hasta(hoy, sincronizacion.MESES_EN_VIVO))
+        reconciliador._a_traer.clear()
+
+    resultados["abrir Estadísticas (meses históricos)"] = medir(
+        lambda: pagina.clic("📈 Estadísticas"), repeticiones, preparar=cargar_historial
+    )
+    pagina.clic("📊 Planilla")
+
+    enviados, completos_por_venta = [], []
+
+    def venta():
+        antes, completos = pagina.controles_enviados, pagina.updates_completos
+        pagina.escribir("Monto Ingreso ($)", "1500")
+        pagina.clic("➕ Agregar Ingreso")
+        enviados.append(pagina.controles_enviados - antes)
+        completos_por_venta.append(pagina.updates_completos - completos)
+
+    resultados["registrar_venta (handler completo)"] = medir(venta, repeticiones)
+    resultados["registrar_venta (handler completo)"]["controles_por_update"] = statistics.median(enviados)
+    resultados["registrar_venta (handler completo)"]["updates_completos"] = max(completos_por_venta)
+
+    subidos = servidor.bytes_recibidos
+    resultados["guardar_cambios (subir una venta)"] = medir(reconciliador.empujar, repeticiones, preparar=venta)
+    resultados["guardar_cambios (subir una venta)"]["bytes_por_subida"] = (servidor.bytes_recibidos - subidos) / repeticiones
+
+    resultados["actualizar_ui (sin cambios)"] = medir(lambda: pagina.clic("📊 Planilla"), repeticiones)
+
+    resultados["cierre: compactar meses cerrados"] = medir(lambda: app_prueba.compactar_en_segundo_plano("Sergio"), 1)
+    reconciliador.traer(list(reconciliador._a_traer))
+    reconciliador._a_traer.clear()
+    resultados["cierre: compactar meses cerrados"]["meses"] = len(servicios["bd"]["resumenes"])
+    resultados["abrir Estadísticas (con resúmenes)"] = medir(
+        lambda: pagina.clic("📈 Estadísticas"), repeticiones, preparar=cargar_historial
+    )
+    pagina.clic("📊 Planilla")
+
+    def descarga_completa():
+        requests.get(sincronizacion.url_nube(), timeout=600).content
+
+    bajados = servidor.bytes_enviados
+    resultados["referencia: GET del documento completo"] = medir(descarga_completa, max(1, repeticiones // 5))
+    resultados["referencia: GET del documento completo"]["bytes"] = (servidor.bytes_enviados - bajados) / max(1, repeticiones // 5)
+    servidor.shutdown()
+    servidor.server_close()
+    return resultados
+
+
+def imprimir(tamaño, resultados):
+    print(f"\n=== {tamaño:,} movimientos ===")
+    print(f"{'operación':45} {'p50 ms':>10} {'p95 ms':>10} {'pico KB':>10}  extra")
+    for nombre, r in resultados.items():
+        extra = ", ".join(f"{k}={v:,.0f}" for k, v in r.items() if k not in ("p50_ms", "p95_ms", "memoria_pico_kb"))
+        print(f"{nombre:45} {r['p50_ms']:>10.2f} {r['p95_ms']:>10.2f} {r['memoria_pico_kb']:>10.0f}  {extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de la caja con historiales sintéticos")
+    parser.add_argument("--tamaños", default="5000,50000", help="Cantidades de movimientos separadas por coma")
+    parser.add_argument("--latencia", type=float, default=0.0, help="Latencia simulada de Firebase en segundos")
+    parser.add_argument("--repeticiones", type=int, default=10)
+    parser.add_argument("--json", help="Guardar los resultados en este archivo")
+    parser.add_argument("--formato", choices=("compacto", "anterior"), default="compacto",
+                        help="Formato de los movimientos y gastos en la nube")
+    args = parser.parse_args()
+
+    todos = {}
+    with tempfile.TemporaryDirectory() as directorio:
+        for tamaño in (int(t) for t in args.tamaños.split(",")):
+            todos[tamaño] = correr_tamaño(tamaño, args.latencia, args.repeticiones, directorio, args.formato == "compacto")
+            imprimir(tamaño, todos[tamaño])
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(todos, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+from datetime import datetime, timedelta
+
+from metricas import METRICAS
+from registros import centavos
+from sincronizacion import (
+    COLECCIONES_RESUMIDAS, alcance_archivo, borrar_si_no_cambio, claves_nube, descargar_nube, guardar_cambios, partes_ruta,
+    ruta_archivo, ruta_particion
+)
+
+REINTENTOS_POR_MES = 3
+
+
+# --- RESÚMENES MENSUALES ---
+# resumenes/<YYYY-MM> = {"ingresos", "gastos", "por_medio", "por_categoria", "por_dia", "por_usuario", ...}
+# Todos los montos del resumen son centavos enteros: la suma de las filas es exacta.
+# Los desgloses son listas y no objetos porque hay medios con "/" ("TARJETA / VIRTUAL"),
+# que Firebase no acepta en una clave.
+def _sumar(tabla, clave, campo, monto):
+    fila = tabla.setdefault(clave, {})
+    fila[campo] = fila.get(campo, 0) + monto
+
+def _lista(tabla, nombre):
+    return [{nombre: clave, **valores} for clave, valores in sorted(tabla.items())]
+
+def resumir_mes(mes, movimientos, gastos, usuario):
+    por_medio, por_categoria, por_dia, por_usuario = {}, {}, {}, {}
+    for m in movimientos.values():
+        monto = centavos(m.get("monto"))
+        _sumar(por_medio, m.get("medio") or "Sin medio", "total", monto)
+        _sumar(por_dia, m.get("fecha"), "ingresos", monto)
+        _sumar(por_usuario, m.get("usuario") or "-", "ingresos", monto)
+    for g in gastos.values():
+        monto = centavos(g.get("monto"))
+        _sumar(por_categoria, g.get("categoria") or "Sin categoría", "total", monto)
+        _sumar(por_dia, g.get("fecha"), "gastos", monto)
+        _sumar(por_usuario, g.get("usuario") or "-", "gastos", monto)
+    return {
+        "mes": mes,
+        "ingresos": sum(centavos(m.get("monto")) for m in movimientos.values()),
+        "gastos": sum(centavos(g.get("monto")) for g in gastos.values()),
+        "cantidad_movimientos": len(movimientos),
+        "cantidad_gastos": len(gastos),
+        "por_medio": _lista(por_medio, "medio"),
+        "por_categoria": _lista(por_categoria, "categoria"),
+        "por_dia": _lista(por_dia, "fecha"),
+        "por_usuario": _lista(por_usuario, "usuario"),
+        "cerrado_por": usuario,
+        "cerrado_el": datetime.now().strftime("%Y-%m-%d %H:%M"),
+    }
+
+
+# --- COMPACTACIÓN ---
+def compactar_mes(mes, usuario):
+    # Primero se escriben el archivo y el resumen (repetirlo no hace daño) y recién después se borran
+    # las filas calientes con if-match: si alguien cargó algo tarde en ese mes, el DELETE falla y se rehace.
+    # Devuelve False en ese caso; ConnectionError si no hay nube.
+    etags = {}
+    calientes = [(c, mes) for c in COLECCIONES_RESUMIDAS]
+    archivadas = alcance_archivo([mes])
+    remoto = descargar_nube(calientes + archivadas, etags)
+    if remoto is None:
+        raise ConnectionError("No se pudo leer el mes a compactar")
+
+    cambios, filas = {}, {}
+    for coleccion in COLECCIONES_RESUMIDAS:
+        filas[coleccion] = {**remoto[(ruta_archivo(coleccion), mes)], **remoto[(coleccion, mes)]}
+        for clave, registro in remoto[(coleccion, mes)].items():
+            cambios[f"{ruta_archivo(coleccion)}/{mes}/{clave}"] = registro
+    cambios[f"resumenes/{mes}"] = resumir_mes(mes, filas["movimientos"], filas["gastos"], usuario)
+    if not guardar_cambios(cambios):
+        raise ConnectionError("No se pudo escribir el resumen del mes")
+
+    for coleccion in COLECCIONES_RESUMIDAS:
+        if remoto[(coleccion, mes)] and not borrar_si_no_cambio(ruta_particion(coleccion, mes), etags[(coleccion, mes)]):
+            return False
+    return True
+
+def meses_a_compactar(hoy, almacen):
+    # Meses que ya no aparecen en la planilla semanal y todavía tienen filas calientes en la nube.
+    # Se saltean los que tienen cambios propios sin subir: se compactan en el próximo cierre.
+    lunes = hoy - timedelta(days=hoy.weekday())
+    limite = min(f"{hoy:%Y-%m}", f"{lunes:%Y-%m}")
+    sin_subir = set()
+    for _, cambios in almacen.pendientes():
+        for ruta in cambios:
+            partes = partes_ruta(ruta)
+            if partes and partes[1]:
+                sin_subir.add(partes[1])
+    meses = set()
+    for coleccion in COLECCIONES_RESUMIDAS:
+        claves = claves_nube(coleccion)
+        if claves is None:
+            raise ConnectionError("No se pudo listar los meses en la nube")
+        meses.update(m for m in claves if m < limite and m not in sin_subir)
+    return sorted(meses)
+
+def compactar_meses_cerrados(hoy, almacen, usuario):
+    # Devuelve los meses que quedaron resumidos
+    compactados = []
+    for mes in meses_a_compactar(hoy, almacen):
+        for _ in range(REINTENTOS_POR_MES):
+            with METRICAS.medir("compactacion.mes_ms"):
+                listo = compactar_mes(mes, usuario)
+            if listo:
+                compactados.append(mes)
+                break
+            METRICAS.contar("compactacion.reintentos")
+    return compactados
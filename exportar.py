@@ -0,0 +1,117 @@
+from datetime import date, datetime
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+
+from registros import centavos, pesos
+from sincronizacion import FACTURAS_PAGADAS
+
+FORMATO_FECHA = "DD/MM/YYYY"
+FORMATO_MONTO = "#,##0.00"
+
+
+def meses_entre(desde, hasta):
+    año, mes = desde.year, desde.month
+    while (año, mes) <= (hasta.year, hasta.month):
+        yield f"{año:04d}-{mes:02d}"
+        año, mes = (año, mes + 1) if mes < 12 else (año + 1, 1)
+
+
+def vencimiento(factura):
+    try:
+        return datetime.strptime(factura.get("vencimiento", ""), "%d/%m/%Y").date()
+    except ValueError:
+        return None
+
+
+# coleccion -> (hoja, encabezados, columnas, fecha del registro, columna a totalizar)
+HOJAS = {
+    "movimientos": (
+        "Ingresos", ["Fecha", "Operador", "Medio", "Monto"],
+        lambda r: [date.fromisoformat(r["fecha"]), r.get("usuario", ""), r.get("medio", ""), r.get("monto", 0)],
+        lambda r: date.fromisoformat(r["fecha"]), 3,
+    ),
+    "gastos": (
+        "Egresos", ["Fecha", "Operador", "Categoría", "Detalle", "Monto"],
+        lambda r: [date.fromisoformat(r["fecha"]), r.get("usuario", ""), r.get("categoria", ""), r.get("detalle", ""), r.get("monto", 0)],
+        lambda r: date.fromisoformat(r["fecha"]), 4,
+    ),
+    "facturas_pendientes": (
+        "Facturas", ["Vencimiento", "Proveedor", "Monto", "Estado", "Cargado por"],
+        lambda r: [vencimiento(r), r.get("proveedor", ""), r.get("monto", 0), r.get("estado", ""), r.get("cargado_por", "")],
+        vencimiento, 2,
+    ),
+    "cierres": (
+        "Cierres", ["Fecha", "Hora", "Cerrado por", "Ingresos", "Egresos", "Saldo"],
+        lambda r: [date.fromisoformat(r["fecha"]), r.get("hora_cierre", ""), r.get("cerrado_por", ""),
+                   r.get("ingresos_dia", ""), r.get("egresos_dia", ""), r.get("saldo_dia", "")],
+        lambda r: date.fromisoformat(r["fecha"]), None,
+    ),
+}
+
+
+def registros_en_rango(leer_particion, coleccion, desde, hasta, al_terminar_particion=None):
+    # Recorre el libro de a una partición por vez: la memoria no depende del largo del rango.
+    # La hoja de facturas junta las pendientes y el archivo de pagadas.
+    if coleccion == "facturas_pendientes":
+        particiones = [(coleccion, None), (FACTURAS_PAGADAS, None)]
+    else:
+        particiones = [(coleccion, mes) for mes in meses_entre(desde, hasta)]
+    fecha_de = HOJAS[coleccion][3]
+    for coleccion_, mes in particiones:
+        registros = []
+        for registro in leer_particion(coleccion_, mes).values():
+            fecha = fecha_de(registro)
+            if fecha is not None and desde <= fecha <= hasta:
+                registros.append((fecha, registro))
+        registros.sort(key=lambda r: r[0])
+        for _, registro in registros:
+            yield registro
+        if al_terminar_particion:
+            al_terminar_particion()
+
+
+def _celdas(hoja, valores, negrita=False):
+    celdas = []
+    for valor in valores:
+        celda = WriteOnlyCell(hoja, value=valor)
+        if isinstance(valor, date):
+            celda.number_format = FORMATO_FECHA
+        elif isinstance(valor, (int, float)):
+            celda.number_format = FORMATO_MONTO
+        if negrita:
+            celda.font = Font(bold=True)
+        celdas.append(celda)
+    return celdas
+
+
+def exportar_excel(ruta, leer_particion, desde, hasta, progreso=None):
+    # Modo write-only de openpyxl: las filas se escriben a disco a medida que se generan
+    libro = Workbook(write_only=True)
+    pasos = len(list(meses_entre(desde, hasta))) * (len(HOJAS) - 1) + 2
+    hechos = [0]
+
+    def avanzar():
+        hechos[0] += 1
+        if progreso:
+            progreso(min(hechos[0] / pasos, 1))
+
+    for coleccion, (titulo, encabezados, columnas, _, col_total) in HOJAS.items():
+        hoja = libro.create_sheet(titulo)
+        hoja.append(_celdas(hoja, encabezados, negrita=True))
+        total = 0
+        try:
+            for registro in registros_en_rango(leer_particion, coleccion, desde, hasta, avanzar):
+                fila = columnas(registro)
+                hoja.append(_celdas(hoja, fila))
+                if col_total is not None:
+                    total += centavos(fila[col_total])
+        except Exception:
+            # Una partición que no se pudo leer corta la exportación: nunca se guarda un libro incompleto
+            hoja.close()
+            raise
+        if col_total is not None:
+            hoja.append(_celdas(hoja, ["TOTAL"] + [None] * (col_total - 1) + [pesos(total)], negrita=True))
+    libro.save(ruta)
+    return ruta
@@ -0,0 +1,289 @@
+"""Servidor local que imita la API REST de Firebase Realtime Database.
+
+Sirve para probar la app sin tocar el proyecto real. Atiende GET/PUT/PATCH/POST/DELETE,
+la escucha en vivo (GET con Accept: text/event-stream, eventos put/patch/keep-alive),
+los ETag (X-Firebase-ETag, if-match en PUT/DELETE -> 412), shallow=true, gzip y el rechazo (400)
+de claves inválidas. Como Firebase, ignora If-None-Match: un GET siempre devuelve el cuerpo.
+
+    python firebase_local.py --puerto 9000
+    FIREBASE_URL=http://127.0.0.1:9000/caja_repuestos python app_prueba.py
+"""
+import argparse
+import base64
+import gzip
+import hashlib
+import json
+import queue
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+_ALFABETO_PUSH = "-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz"
+
+
+def _clave_push():
+    ms = int(time.time() * 1000)
+    prefijo = ""
+    for _ in range(8):
+        prefijo = _ALFABETO_PUSH[ms % 64] + prefijo
+        ms //= 64
+    return prefijo + "".join(random.choice(_ALFABETO_PUSH) for _ in range(12))
+
+
+def _partes(ruta):
+    return [p for p in ruta.strip("/").split("/") if p]
+
+
+def _normalizar(valor):
+    # Firebase guarda las listas como objetos con claves numéricas y descarta nulos y objetos vacíos
+    if isinstance(valor, list):
+        valor = {str(i): v for i, v in enumerate(valor)}
+    if isinstance(valor, dict):
+        limpio = {}
+        for k, v in valor.items():
+            v = _normalizar(v)
+            if v is not None:
+                limpio[str(k)] = v
+        return limpio or None
+    return valor
+
+
+def _claves_validas(valor):
+    # Firebase rechaza (400) claves con . $ # [ ] o /
+    if isinstance(valor, dict):
+        return all(not set(str(k)) & set(".$#[]/") and _claves_validas(v) for k, v in valor.items())
+    if isinstance(valor, list):
+        return all(_claves_validas(v) for v in valor)
+    return True
+
+
+def _etag(valor):
+    # Huella del contenido: el mismo valor da siempre el mismo ETag, como en Firebase
+    if valor is None:
+        return "null_etag"
+    cuerpo = json.dumps(valor, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return base64.b64encode(hashlib.sha1(cuerpo).digest()).decode("ascii")
+
+
+def _como_lista(valor):
+    # Misma heurística que Firebase: claves enteras densas se devuelven como arreglo
+    if isinstance(valor, dict):
+        valor = {k: _como_lista(v) for k, v in valor.items()}
+        if valor and all(k.isdigit() for k in valor):
+            maximo = max(int(k) for k in valor)
+            if maximo < 2 * len(valor):
+                return [valor.get(str(i)) for i in range(maximo + 1)]
+    return valor
+
+
+class ArbolFirebase:
+    def __init__(self, datos=None):
+        self.raiz = _normalizar(datos)
+        self.lock = threading.Lock()
+        self.escuchas = []
+
+    def escuchar(self, ruta):
+        cola = queue.Queue()
+        with self.lock:
+            self.escuchas.append((_partes(ruta), cola))
+            cola.put(("put", {"path": "/", "data": self._leer(_partes(ruta))}))
+        return cola
+
+    def dejar_de_escuchar(self, cola):
+        with self.lock:
+            self.escuchas = [(p, c) for p, c in self.escuchas if c is not cola]
+
+    def _leer(self, partes):
+        nodo = self.raiz
+        for p in partes:
+            if not isinstance(nodo, dict) or p not in nodo:
+                return None
+            nodo = nodo[p]
+        return _como_lista(json.loads(json.dumps(nodo)))
+
+    def _notificar(self, evento, partes, datos):
+        # Mismo criterio que Firebase: cada escucha recibe solo lo que cambió debajo de su ruta, relativo a ella
+        for base, cola in self.escuchas:
+            if partes[:len(base)] == base:
+                relativa = "/" + "/".join(partes[len(base):])
+                cola.put((evento, {"path": relativa, "data": datos}))
+            elif base[:len(partes)] != partes:
+                continue
+            elif evento == "put":
+                # Un put en un ancestro reemplaza todo lo de la escucha
+                cola.put(("put", {"path": "/", "data": self._leer(base)}))
+            else:
+                # Un patch multi-ruta en un ancestro: solo las rutas que caen debajo de la escucha
+                cambios, reemplazada = {}, False
+                for sub, valor in datos.items():
+                    ruta = partes + _partes(sub)
+                    if len(ruta) > len(base) and ruta[:len(base)] == base:
+                        cambios["/".join(ruta[len(base):])] = valor
+                    elif base[:len(ruta)] == ruta:
+                        reemplazada = True
+                if reemplazada:
+                    cola.put(("put", {"path": "/", "data": self._leer(base)}))
+                elif cambios:
+                    cola.put(("patch", {"path": "/", "data": cambios}))
+
+    def obtener(self, ruta):
+        with self.lock:
+            return self._leer(_partes(ruta))
+
+    def fijar(self, ruta, valor, si_coincide=None):
+        # Con si_coincide (if-match) solo escribe si el ETag actual es ese; devuelve (escribió, valor actual)
+        with self.lock:
+            if si_coincide is not None:
+                actual = self._leer(_partes(ruta))
+                if _etag(actual) != si_coincide:
+                    return False, actual
+            self.raiz = self._fijar(self.raiz, _partes(ruta), _normalizar(valor))
+            self._notificar("put", _partes(ruta), valor)
+            return True, valor
+
+    def actualizar(self, ruta, cambios):
+        with self.lock:
+            base = _partes(ruta)
+            for sub, valor in cambios.items():
+                self.raiz = self._fijar(self.raiz, base + _partes(sub), _normalizar(valor))
+            self._notificar("patch", base, cambios)
+
+    def _fijar(self, nodo, partes, valor):
+        if not partes:
+            return valor
+        nodo = dict(nodo) if isinstance(nodo, dict) else {}
+        hijo = self._fijar(nodo.get(partes[0]), partes[1:], valor)
+        if hijo is None:
+            nodo.pop(partes[0], None)
+        else:
+            nodo[partes[0]] = hijo
+        return nodo or None
+
+
+class _Manejador(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, formato, *args):
+        pass
+
+    @property
+    def ruta(self):
+        ruta = urlsplit(self.path).path
+        return ruta[:-5] if ruta.endswith(".json") else ruta
+
+    def _leer_cuerpo(self):
+        largo = int(self.headers.get("Content-Length") or 0)
+        self.server.bytes_recibidos += largo
+        return json.loads(self.rfile.read(largo) or b"null")
+
+    def _responder(self, valor, estado=200, etag=None):
+        if self.server.latencia:
+            time.sleep(self.server.latencia)
+        cuerpo = json.dumps(valor).encode("utf-8")
+        comprimir = len(cuerpo) > 1024 and "gzip" in self.headers.get("Accept-Encoding", "")
+        if comprimir:
+            cuerpo = gzip.compress(cuerpo)
+        self.server.bytes_enviados += len(cuerpo)
+        self.send_response(estado)
+        self.send_header("Content-Type", "application/json")
+        if comprimir:
+            self.send_header("Content-Encoding", "gzip")
+        if etag and (self.headers.get("X-Firebase-ETag") == "true" or estado == 412):
+            self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def do_GET(self):
+        if "text/event-stream" in self.headers.get("Accept", ""):
+            return self._transmitir()
+        valor = self.server.arbol.obtener(self.ruta)
+        if parse_qs(urlsplit(self.path).query).get("shallow") == ["true"] and isinstance(valor, (dict, list)):
+            valor = {str(k): True for k in (valor if isinstance(valor, dict) else range(len(valor)))}
+        self._responder(valor, etag=_etag(valor))
+
+    def _transmitir(self):
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        cola = self.server.arbol.escuchar(self.ruta)
+        try:
+            while True:
+                try:
+                    evento, datos = cola.get(timeout=self.server.intervalo_keep_alive)
+                except queue.Empty:
+                    evento, datos = "keep-alive", None
+                cuerpo = f"event: {evento}\ndata: {json.dumps(datos)}\n\n".encode("utf-8")
+                self.server.bytes_enviados += len(cuerpo)
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(cuerpo), cuerpo))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.server.arbol.dejar_de_escuchar(cola)
+
+    def _escribir_condicional(self, valor):
+        escribio, actual = self.server.arbol.fijar(self.ruta, valor, self.headers.get("if-match"))
+        if not escribio:
+            return self._responder(actual, 412, _etag(actual))
+        self._responder(valor, etag=_etag(self.server.arbol.obtener(self.ruta)))
+
+    def do_PUT(self):
+        valor = self._leer_cuerpo()
+        if not _claves_validas(valor):
+            return self._responder({"error": "Invalid data; couldn't parse key."}, 400)
+        self._escribir_condicional(valor)
+
+    def do_PATCH(self):
+        cambios = self._leer_cuerpo()
+        if not isinstance(cambios, dict):
+            return self._responder({"error": "Invalid data; couldn't parse JSON object."}, 400)
+        if not _claves_validas({sub.replace("/", ""): v for sub, v in cambios.items()}):
+            return self._responder({"error": "Invalid data; couldn't parse key."}, 400)
+        self.server.arbol.actualizar(self.ruta, cambios)
+        self._responder(cambios)
+
+    def do_POST(self):
+        valor = self._leer_cuerpo()
+        clave = _clave_push()
+        self.server.arbol.fijar(f"{self.ruta}/{clave}", valor)
+        self._responder({"name": clave})
+
+    def do_DELETE(self):
+        self._escribir_condicional(None)
+
+
+def iniciar_servidor(datos=None, puerto=0, host="127.0.0.1", latencia=0):
+    servidor = ThreadingHTTPServer((host, puerto), _Manejador)
+    servidor.daemon_threads = True
+    servidor.arbol = ArbolFirebase(datos)
+    servidor.bytes_recibidos = 0
+    servidor.bytes_enviados = 0
+    servidor.intervalo_keep_alive = 30
+    servidor.latencia = latencia
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f"http://{host}:{servidor.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Firebase Realtime Database local (REST)")
+    parser.add_argument("--puerto", type=int, default=9000)
+    parser.add_argument("--datos", help="Archivo JSON con el estado inicial")
+    parser.add_argument("--latencia", type=float, default=0, help="Demora en segundos antes de cada respuesta")
+    args = parser.parse_args()
+
+    inicial = None
+    if args.datos:
+        with open(args.datos, encoding="utf-8") as f:
+            inicial = json.load(f)
+    servidor, url = iniciar_servidor(inicial, args.puerto, latencia=args.latencia)
+    print(f"Firebase local escuchando en {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        servidor.shutdown()
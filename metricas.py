@@ -0,0 +1,80 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# --- MÉTRICAS DE RENDIMIENTO ---
+# Cada métrica guarda sus últimas VENTANA muestras: los percentiles siguen a las condiciones
+# actuales (tamaño de los datos, red) en vez de promediar todo lo que pasó desde el arranque.
+VENTANA = 500
+
+
+class Metricas:
+    def __init__(self, ventana=VENTANA):
+        self.ventana = ventana
+        self.muestras = {}
+        self.contadores = {}
+        self.valores = {}
+        self.lock = threading.Lock()
+
+    def registrar(self, nombre, valor):
+        with self.lock:
+            if nombre not in self.muestras:
+                self.muestras[nombre] = deque(maxlen=self.ventana)
+            self.muestras[nombre].append(valor)
+
+    def contar(self, nombre, cantidad=1):
+        with self.lock:
+            self.contadores[nombre] = self.contadores.get(nombre, 0) + cantidad
+
+    def fijar(self, nombre, valor):
+        with self.lock:
+            self.valores[nombre] = valor
+
+    @contextmanager
+    def medir(self, nombre):
+        # Duración en milisegundos; si el bloque lanza una excepción igual queda registrada
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar(nombre, (time.perf_counter() - inicio) * 1000)
+
+    def resumen(self):
+        with self.lock:
+            muestras = {nombre: sorted(valores) for nombre, valores in self.muestras.items()}
+            contadores, valores = dict(self.contadores), dict(self.valores)
+        percentiles = {}
+        for nombre, ordenadas in muestras.items():
+            percentiles[nombre] = {
+                "n": len(ordenadas),
+                "p50": _percentil(ordenadas, 0.50),
+                "p95": _percentil(ordenadas, 0.95),
+                "p99": _percentil(ordenadas, 0.99),
+                "max": ordenadas[-1],
+            }
+        return {"percentiles": percentiles, "contadores": contadores, "valores": valores}
+
+    def texto(self):
+        # Una sola línea, fácil de buscar en los logs: "metricas nube.bajada_ms p50=12.3 p95=40.1 ... | sesiones=3"
+        resumen = self.resumen()
+        partes = [
+            f"{nombre} n={p['n']} p50={p['p50']:.1f} p95={p['p95']:.1f} max={p['max']:.1f}"
+            for nombre, p in sorted(resumen["percentiles"].items())
+        ]
+        partes += [f"{nombre}={valor}" for nombre, valor in sorted({**resumen["contadores"], **resumen["valores"]}.items())]
+        return "metricas " + " | ".join(partes)
+
+    def reiniciar(self):
+        with self.lock:
+            self.muestras.clear()
+            self.contadores.clear()
+            self.valores.clear()
+
+
+def _percentil(ordenadas, fraccion):
+    return ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * fraccion))]
+
+
+# Una sola instancia por proceso, compartida por el cliente de la nube, el almacén y todas las sesiones
+METRICAS = Metricas()
@@ -0,0 +1,70 @@
+"""Migración única de movimientos y gastos al formato compacto (registros.py).
+
+Antes:   movimientos/2026-10/<clave> = {"fecha": "2026-10-18", "usuario": "Sergio", "monto": 1500.5, "medio": "EFECTIVO"}
+Después: movimientos/2026-10/<clave> = [739907, 2, 0, 150050]
+
+Convierte también las filas del archivo frío (archivo/movimientos, archivo/gastos). La app lee los dos
+formatos, así que la migración se puede cortar y retomar; igual conviene correrla con la app detenida:
+
+    python migrar_compacto.py --seco     # muestra qué haría
+    python migrar_compacto.py            # guarda un respaldo y migra
+"""
+import argparse
+import json
+from datetime import datetime
+
+import requests
+
+from registros import CAMPOS, codificar
+from sincronizacion import ARCHIVO, _a_diccionario, url_nube
+
+
+def planificar(datos):
+    # Un PATCH por colección (y por colección archivada) con cada fila en formato anterior ya convertida
+    lotes = {}
+    for prefijo, base in (("", datos or {}), (f"{ARCHIVO}/", (datos or {}).get(ARCHIVO) or {})):
+        for coleccion in CAMPOS:
+            cambios = {}
+            for mes, filas in _a_diccionario(base.get(coleccion)).items():
+                for clave, registro in _a_diccionario(filas).items():
+                    if not isinstance(registro, dict):
+                        continue
+                    if not registro.get("fecha"):
+                        print(f"Aviso: {prefijo}{coleccion}/{mes}/{clave} no tiene fecha, se deja sin migrar")
+                        continue
+                    cambios[f"{prefijo}{coleccion}/{mes}/{clave}"] = codificar(coleccion, registro)
+            if cambios:
+                lotes[f"{prefijo}{coleccion}"] = cambios
+    return lotes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convierte movimientos y gastos de caja_repuestos al formato compacto")
+    parser.add_argument("--seco", action="store_true", help="No escribe nada, solo informa")
+    args = parser.parse_args()
+
+    respuesta = requests.get(url_nube(), timeout=60)
+    respuesta.raise_for_status()
+    datos = respuesta.json()
+    lotes = planificar(datos)
+    if not lotes:
+        print("Nada para migrar: todas las filas ya están en formato compacto.")
+        return
+
+    for ruta, cambios in lotes.items():
+        print(f"{ruta}: {len(cambios)} registros a convertir")
+    if args.seco:
+        return
+
+    respaldo = f"respaldo_caja_repuestos_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(respaldo, "w", encoding="utf-8") as f:
+        json.dump(datos, f, ensure_ascii=False)
+    print(f"Respaldo guardado en {respaldo}")
+
+    for ruta, cambios in lotes.items():
+        requests.patch(url_nube(), json=cambios, timeout=60).raise_for_status()
+        print(f"{ruta}: migrada")
+
+
+if __name__ == "__main__":
+    main()
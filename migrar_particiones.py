@@ -0,0 +1,84 @@
+"""Migración única del esquema plano al esquema particionado por mes.
+
+Antes:   caja_repuestos/movimientos/<clave>
+Después: caja_repuestos/movimientos/2026-10/<clave>   (igual para gastos y cierres)
+
+Las facturas ya pagadas pasan de facturas_pendientes/<clave> al archivo facturas_pagadas/<clave>.
+
+Correr con la app detenida y sin cambios pendientes de subir:
+
+    python migrar_particiones.py --seco     # muestra qué haría
+    python migrar_particiones.py            # guarda un respaldo y migra
+"""
+import argparse
+import json
+import re
+from datetime import datetime
+
+import requests
+
+from exportar import vencimiento
+from sincronizacion import COLECCIONES_POR_MES, FACTURAS_PAGADAS, _a_diccionario, ruta_registro, url_nube
+
+_MES = re.compile(r"^\d{4}-\d{2}$")
+
+
+def planificar(datos):
+    # Un PATCH por colección: escribe cada registro plano en su partición y borra la clave vieja
+    lotes = {}
+    for coleccion in COLECCIONES_POR_MES:
+        cambios = {}
+        for clave, registro in _a_diccionario((datos or {}).get(coleccion)).items():
+            if _MES.match(clave) or not isinstance(registro, dict):
+                continue
+            if not registro.get("fecha"):
+                print(f"Aviso: {coleccion}/{clave} no tiene fecha, se deja sin migrar")
+                continue
+            cambios[ruta_registro(coleccion, clave, registro)] = registro
+            cambios[f"{coleccion}/{clave}"] = None
+        if cambios:
+            lotes[coleccion] = cambios
+
+    # Las pagadas no tienen fecha de pago registrada: se archivan con la de vencimiento
+    cambios = {}
+    for clave, factura in _a_diccionario((datos or {}).get("facturas_pendientes")).items():
+        if not isinstance(factura, dict) or factura.get("estado") != "PAGADO":
+            continue
+        venc = vencimiento(factura)
+        cambios[f"{FACTURAS_PAGADAS}/{clave}"] = {**factura, "fecha": str(venc) if venc else datetime.now().strftime("%Y-%m-%d")}
+        cambios[f"facturas_pendientes/{clave}"] = None
+    if cambios:
+        lotes[FACTURAS_PAGADAS] = cambios
+    return lotes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migra caja_repuestos al esquema particionado por mes")
+    parser.add_argument("--seco", action="store_true", help="No escribe nada, solo informa")
+    args = parser.parse_args()
+
+    respuesta = requests.get(url_nube(), timeout=60)
+    respuesta.raise_for_status()
+    datos = respuesta.json()
+    lotes = planificar(datos)
+    if not lotes:
+        print("Nada para migrar: la base ya está particionada y sin facturas pagadas en las pendientes.")
+        return
+
+    for coleccion, cambios in lotes.items():
+        print(f"{coleccion}: {len(cambios) // 2} registros a migrar")
+    if args.seco:
+        return
+
+    respaldo = f"respaldo_caja_repuestos_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(respaldo, "w", encoding="utf-8") as f:
+        json.dump(datos, f, ensure_ascii=False)
+    print(f"Respaldo guardado en {respaldo}")
+
+    for coleccion, cambios in lotes.items():
+        requests.patch(url_nube(), json=cambios, timeout=60).raise_for_status()
+        print(f"{coleccion}: migrada")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Página de Flet sin navegador para manejar los handlers de main() desde benchmark.py y las pruebas.
+
+Guarda los controles agregados, cuenta lo que se manda en cada page.update() y corre
+page.run_thread() en el mismo hilo, así cada clic termina antes de volver:
+
+    pagina = PaginaSimulada({})
+    app_prueba.main(pagina)
+    pagina.iniciar_sesion()
+    pagina.escribir("Monto Ingreso ($)", "1500")
+    pagina.clic("➕ Agregar Ingreso")
+"""
+import types
+
+import flet as ft
+
+
+class PubSubSimulado:
+    def __init__(self, hub, session_id):
+        self.hub = hub
+        self.session_id = session_id
+
+    def subscribe(self, handler):
+        self.hub[self.session_id] = handler
+
+    def send_all(self, mensaje):
+        for handler in list(self.hub.values()):
+            handler(mensaje)
+
+    def send_others(self, mensaje):
+        for session_id, handler in list(self.hub.items()):
+            if session_id != self.session_id:
+                handler(mensaje)
+
+    def unsubscribe_all(self):
+        self.hub.pop(self.session_id, None)
+
+
+class PaginaSimulada:
+    # Lo mínimo de ft.Page que usa main(): cuenta los controles enviados y los page.update() completos
+    def __init__(self, hub):
+        self.session_id = f"bench-{id(self)}"
+        self.pubsub = PubSubSimulado(hub, self.session_id)
+        self.window = types.SimpleNamespace()
+        self.overlay = []
+        self.controls = []
+        self.controles_enviados = 0
+        self.updates_completos = 0
+
+    def add(self, *controles):
+        self.controls.extend(controles)
+
+    def update(self, *controles):
+        # Un page.update() sin controles recorre toda la página: se cuenta aparte
+        if controles:
+            self.controles_enviados += len(controles)
+        else:
+            self.updates_completos += 1
+
+    def run_thread(self, handler, *args, **kwargs):
+        handler(*args, **kwargs)
+
+    def launch_url(self, url, **kwargs):
+        self.ultima_url = url
+
+    def recorrer(self, control=None):
+        pendientes = list(self.controls) if control is None else [control]
+        while pendientes:
+            actual = pendientes.pop()
+            yield actual
+            for atributo in ("controls", "content", "rows", "cells", "actions"):
+                hijo = getattr(actual, atributo, None)
+                if isinstance(hijo, list):
+                    pendientes.extend(hijo)
+                elif hijo is not None:
+                    pendientes.append(hijo)
+
+    def control(self, tipo, **filtros):
+        for c in self.recorrer():
+            if isinstance(c, tipo) and all(getattr(c, k, None) == v for k, v in filtros.items()):
+                return c
+        raise LookupError(f"No hay {tipo.__name__} con {filtros}")
+
+    def clic(self, texto):
+        self.control(ft.ElevatedButton, text=texto).on_click(None)
+
+    def escribir(self, etiqueta, valor):
+        self.control(ft.TextField, label=etiqueta).value = valor
+
+    def iniciar_sesion(self, usuario="Sergio"):
+        self.control(ft.Dropdown, label="Seleccionar Usuario").value = usuario
+        self.escribir("Clave de Acceso", "181214")
+        self.clic("Iniciar Sesión")
@@ -0,0 +1,91 @@
+import sys
+from datetime import date
+
+# --- FORMATO COMPACTO DE MOVIMIENTOS Y GASTOS ---
+# En la nube y en el disco cada fila es una lista corta en lugar de un objeto con nombres de campo:
+#   movimientos: [fecha (ordinal), usuario, medio, centavos]
+#   gastos:      [fecha (ordinal), usuario, categoria, centavos, detalle]
+# Los textos conocidos viajan como su posición en estas tablas; los demás, como texto.
+# Las tablas solo crecen al final: cambiar el orden cambiaría el significado de lo ya guardado.
+USUARIOS = ("Mamá", "Julián", "Sergio")
+MEDIOS = ("EFECTIVO", "TARJETA / VIRTUAL")
+CATEGORIAS = ("Pago a Proveedor", "Gasto Vario", "Retiro de Caja")
+
+CAMPOS = {
+    "movimientos": ("fecha", "usuario", "medio", "monto"),
+    "gastos": ("fecha", "usuario", "categoria", "monto", "detalle"),
+}
+_TABLAS = {"usuario": USUARIOS, "medio": MEDIOS, "categoria": CATEGORIAS}
+_CODIGOS = {campo: {texto: i for i, texto in enumerate(tabla)} for campo, tabla in _TABLAS.items()}
+
+
+def centavos(monto):
+    # Los montos se suman en centavos enteros: los totales no arrastran errores de redondeo
+    return round((monto or 0) * 100)
+
+def pesos(centavos_):
+    return centavos_ / 100
+
+
+def codificar(coleccion, registro):
+    if coleccion not in CAMPOS or not isinstance(registro, dict):
+        return registro
+    fila = [date.fromisoformat(registro["fecha"]).toordinal()]
+    for campo in CAMPOS[coleccion][1:]:
+        valor = registro.get(campo)
+        if campo == "monto":
+            fila.append(centavos(valor))
+        elif campo in _CODIGOS:
+            fila.append(_CODIGOS[campo].get(valor, valor or ""))
+        else:
+            fila.append(valor or "")
+    while fila[-1] == "":
+        fila.pop()
+    return fila
+
+def decodificar(coleccion, valor):
+    # Acepta también el formato anterior (objeto con nombres de campo), que se devuelve tal cual
+    if coleccion not in CAMPOS or isinstance(valor, dict) and "fecha" in valor or valor is None:
+        return valor
+    if isinstance(valor, dict):
+        # Firebase devuelve como objeto una lista a la que le faltan posiciones
+        valor = [valor.get(str(i)) for i in range(len(CAMPOS[coleccion]))]
+    registro = {}
+    for campo, dato in zip(CAMPOS[coleccion], valor):
+        if campo == "fecha":
+            dato = date.fromordinal(dato).isoformat()
+        elif campo == "monto":
+            dato = pesos(dato or 0)
+        elif campo in _TABLAS and isinstance(dato, int):
+            dato = _TABLAS[campo][dato]
+        registro[campo] = dato if dato is not None else ""
+    for campo in CAMPOS[coleccion][len(valor):]:
+        registro[campo] = 0 if campo == "monto" else ""
+    return registro
+
+
+# --- FILAS EN MEMORIA ---
+# __slots__ en lugar de un dict por fila, textos internados (una sola copia de "EFECTIVO" en todo
+# el proceso) y el monto en centavos
+class Movimiento:
+    __slots__ = ("fecha", "usuario", "medio", "centavos")
+
+    def __init__(self, registro):
+        self.fecha = sys.intern(registro.get("fecha") or "")
+        self.usuario = sys.intern(registro.get("usuario") or "")
+        self.medio = sys.intern(registro.get("medio") or "")
+        self.centavos = centavos(registro.get("monto"))
+
+
+class Gasto:
+    __slots__ = ("fecha", "usuario", "categoria", "detalle", "centavos")
+
+    def __init__(self, registro):
+        self.fecha = sys.intern(registro.get("fecha") or "")
+        self.usuario = sys.intern(registro.get("usuario") or "")
+        self.categoria = sys.intern(registro.get("categoria") or "Sin categoría")
+        self.detalle = registro.get("detalle") or ""
+        self.centavos = centavos(registro.get("monto"))
+
+
+FILAS = {"movimientos": Movimiento, "gastos": Gasto}
@@ -0,0 +1,446 @@
+import json
+import os
+import random
+import threading
+import time
+from datetime import date
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metricas import METRICAS
+from registros import codificar, decodificar
+
+# --- CONEXIÓN A FIREBASE EN LA NUBE ---
+FIREBASE_URL = os.environ.get("FIREBASE_URL", "https://cajarepuestos-214aa-default-rtdb.firebaseio.com/caja_repuestos")
+COLECCIONES = ("movimientos", "gastos", "facturas_pendientes", "cierres", "resumenes")
+# Estas colecciones se guardan particionadas por mes: movimientos/2026-10/<clave>
+COLECCIONES_POR_MES = ("movimientos", "gastos", "cierres")
+# Las que no se particionan se traen completas junto con cualquier mes
+COLECCIONES_PLANAS = ("facturas_pendientes", "resumenes")
+# Al cerrar un mes sus filas pasan al archivo frío (archivo/movimientos/2026-08/<clave>)
+# y quedan solo los totales en resumenes/2026-08
+COLECCIONES_RESUMIDAS = ("movimientos", "gastos")
+ARCHIVO = "archivo"
+# Las facturas pagadas se archivan aparte: no se cargan al iniciar ni se escuchan en vivo
+FACTURAS_PAGADAS = "facturas_pagadas"
+MESES_EN_VIVO = 2
+_ALFABETO_PUSH = "-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz"
+
+# Una sola sesión por proceso: conexiones TLS reutilizadas (keep-alive) y respuestas comprimidas
+# (requests pide gzip por defecto). Alcanza para el reconciliador, las escuchas en vivo y las exportaciones.
+_sesion = requests.Session()
+_sesion.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+_sesion.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
+def url_nube(ruta=""):
+    return f"{FIREBASE_URL}/{ruta}.json" if ruta else f"{FIREBASE_URL}.json"
+
+def nueva_clave():
+    # Mismo formato que los push IDs de Firebase: ordenables por fecha de alta
+    ms = int(time.time() * 1000)
+    prefijo = ""
+    for _ in range(8):
+        prefijo = _ALFABETO_PUSH[ms % 64] + prefijo
+        ms //= 64
+    return prefijo + "".join(random.choice(_ALFABETO_PUSH) for _ in range(12))
+
+def _a_diccionario(valor):
+    # Los datos viejos se guardaron como listas; Firebase las devuelve como arreglo u objeto según las claves
+    if isinstance(valor, list):
+        return {str(i): r for i, r in enumerate(valor) if r is not None}
+    if isinstance(valor, dict):
+        return {k: r for k, r in valor.items() if r is not None}
+    return {}
+
+# --- ESQUEMA PARTICIONADO ---
+def particion(coleccion, registro):
+    return (registro.get("fecha") or "")[:7] if coleccion in COLECCIONES_POR_MES else None
+
+def ruta_registro(coleccion, clave, registro):
+    mes = particion(coleccion, registro)
+    return f"{coleccion}/{mes}/{clave}" if mes else f"{coleccion}/{clave}"
+
+def ruta_particion(coleccion, mes):
+    return f"{coleccion}/{mes}" if mes else coleccion
+
+def partes_ruta(ruta):
+    # "movimientos/2026-10/clave/campo" o "facturas_pendientes/clave/campo" -> (coleccion, mes, clave, campos)
+    partes = [p for p in ruta.split("/") if p]
+    if not partes or (partes[0] not in COLECCIONES and partes[0] != FACTURAS_PAGADAS):
+        return None
+    if partes[0] in COLECCIONES_POR_MES:
+        partes += [None] * (3 - len(partes))
+        return partes[0], partes[1], partes[2], partes[3:]
+    partes += [None] * (2 - len(partes))
+    return partes[0], None, partes[1], partes[2:]
+
+def _codificar_cambios(cambios):
+    # Los movimientos y gastos viajan en formato compacto (ver registros.py), también dentro del archivo frío
+    codificados = {}
+    for ruta, valor in cambios.items():
+        partes = partes_ruta(coleccion_de(ruta))
+        if partes and partes[2] and not partes[3]:
+            valor = codificar(partes[0], valor)
+        elif partes and partes[1] and partes[2] is None and isinstance(valor, dict):
+            valor = {clave: codificar(partes[0], registro) for clave, registro in valor.items()}
+        codificados[ruta] = valor
+    return codificados
+
+def meses_hasta(hoy, cantidad):
+    año, mes = hoy.year, hoy.month
+    meses = []
+    for _ in range(cantidad):
+        meses.append(f"{año:04d}-{mes:02d}")
+        año, mes = (año, mes - 1) if mes > 1 else (año - 1, 12)
+    return meses
+
+def ruta_archivo(coleccion):
+    return f"{ARCHIVO}/{coleccion}"
+
+def coleccion_de(ruta):
+    # "archivo/movimientos/..." -> "movimientos/...": las filas archivadas tienen el formato de las calientes
+    return ruta[len(ARCHIVO) + 1:] if ruta.startswith(f"{ARCHIVO}/") else ruta
+
+def alcance_archivo(meses):
+    return [(ruta_archivo(c), m) for c in COLECCIONES_RESUMIDAS for m in meses]
+
+def alcance(meses, con_planas=True):
+    # Particiones (coleccion, mes) a traer; las facturas y los resúmenes no se particionan
+    particiones = [(c, m) for c in COLECCIONES_POR_MES for m in meses]
+    return particiones + [(c, None) for c in COLECCIONES_PLANAS] if con_planas else particiones
+
+def alcance_en_vivo():
+    return alcance(meses_hasta(date.today(), MESES_EN_VIVO))
+
+def descargar_nube(particiones, etags=None):
+    # Devuelve None si falla: una descarga fallida nunca se confunde con una base vacía.
+    # Con etags ({(coleccion, mes): etag}) las particiones cuyo ETag no cambió no se parsean, no se comparan
+    # ni se devuelven, y el diccionario queda con los ETag de lo que sí cambió. Firebase documenta el ETag
+    # (X-Firebase-ETag) pero no If-None-Match: el cuerpo igual viaja; si algún día responde 304, no viaja.
+    remoto = {}
+    try:
+        with METRICAS.medir("nube.bajada_ms"):
+            for particion_ in particiones:
+                conocido = (etags or {}).get(particion_)
+                encabezados = {"X-Firebase-ETag": "true"}
+                if conocido:
+                    encabezados["If-None-Match"] = conocido
+                respuesta = _sesion.get(url_nube(ruta_particion(*particion_)), headers=encabezados, timeout=10)
+                respuesta.raise_for_status()
+                etag = respuesta.headers.get("ETag")
+                if respuesta.status_code == 304 or (conocido and etag == conocido):
+                    METRICAS.contar("nube.bajada_sin_cambios")
+                    continue
+                METRICAS.registrar("nube.bajada_bytes", int(respuesta.headers.get("Content-Length") or len(respuesta.content)))
+                coleccion = coleccion_de(particion_[0])
+                remoto[particion_] = {clave: decodificar(coleccion, r) for clave, r in _a_diccionario(respuesta.json()).items()}
+                if etags is not None and etag:
+                    etags[particion_] = etag
+    except Exception as e:
+        METRICAS.contar("nube.bajada_fallos")
+        print(f"Alerta: No se pudo conectar a la nube. {e}")
+        return None
+    return remoto
+
+def claves_nube(ruta):
+    # GET superficial (shallow): solo las claves del primer nivel, sin bajar el contenido. None si falla.
+    try:
+        respuesta = _sesion.get(url_nube(ruta), params={"shallow": "true"}, timeout=10)
+        respuesta.raise_for_status()
+        return list(respuesta.json() or {})
+    except Exception as e:
+        print(f"Alerta: No se pudo conectar a la nube. {e}")
+        return None
+
+def borrar_si_no_cambio(ruta, etag):
+    # DELETE condicional (if-match): False si alguien escribió en esa ruta desde que se leyó
+    respuesta = _sesion.delete(url_nube(ruta), headers={"if-match": etag}, timeout=10)
+    if respuesta.status_code == 412:
+        return False
+    respuesta.raise_for_status()
+    return True
+
+def eventos_nube(ruta=""):
+    # Protocolo REST streaming de Firebase (text/event-stream): genera (evento, datos) hasta que se corte
+    with _sesion.get(url_nube(ruta), headers={"Accept": "text/event-stream"}, stream=True, timeout=(10, 75)) as respuesta:
+        respuesta.raise_for_status()
+        evento, datos = None, []
+        for linea in respuesta.iter_lines(chunk_size=None, decode_unicode=True):
+            if linea.startswith("event:"):
+                evento = linea[6:].strip()
+            elif linea.startswith("data:"):
+                datos.append(linea[5:].strip())
+            elif not linea and evento:
+                yield evento, json.loads("\n".join(datos) or "null")
+                evento, datos = None, []
+
+class CambiosRechazados(Exception):
+    # La nube rechazó el contenido (o no se puede ni armar el pedido): reintentarlo no sirve
+    pass
+
+# Errores 4xx que no dependen del contenido: credenciales, demora o límite de pedidos, se reintentan
+_ERRORES_PASAJEROS = (401, 403, 408, 429)
+
+def guardar_cambios(cambios):
+    # Escritura multi-ruta: solo viajan los registros nuevos o los campos modificados.
+    # False si falló la conexión (se puede reintentar); CambiosRechazados si el contenido es inválido.
+    try:
+        cuerpo = json.dumps(_codificar_cambios(cambios), separators=(",", ":"), allow_nan=False)
+    except (KeyError, TypeError, ValueError, OverflowError) as e:
+        METRICAS.contar("nube.subida_rechazos")
+        raise CambiosRechazados(f"Datos inválidos: {e}") from e
+    METRICAS.registrar("nube.subida_bytes", len(cuerpo.encode("utf-8")))
+    try:
+        with METRICAS.medir("nube.subida_ms"):
+            respuesta = _sesion.patch(url_nube(), data=cuerpo, headers={"Content-Type": "application/json"}, timeout=10)
+    except Exception as e:
+        METRICAS.contar("nube.subida_fallos")
+        print(f"Error crítico al guardar en la nube: {e}")
+        return False
+    if 400 <= respuesta.status_code < 500 and respuesta.status_code not in _ERRORES_PASAJEROS:
+        METRICAS.contar("nube.subida_rechazos")
+        raise CambiosRechazados(f"Firebase respondió {respuesta.status_code}: {respuesta.text[:200]}")
+    if not respuesta.ok:
+        METRICAS.contar("nube.subida_fallos")
+        print(f"Error crítico al guardar en la nube: HTTP {respuesta.status_code}")
+        return False
+    return True
+
+
+def _fijar_anidado(nodo, partes, valor):
+    nodo = dict(nodo) if isinstance(nodo, dict) else {}
+    if len(partes) > 1:
+        valor = _fijar_anidado(nodo.get(partes[0]), partes[1:], valor)
+    if valor is None:
+        nodo.pop(partes[0], None)
+    else:
+        nodo[partes[0]] = valor
+    return nodo
+
+def combinar(lote):
+    # Junta varias escrituras multi-ruta en una sola. Firebase rechaza un PATCH con una ruta
+    # y otra anidada debajo, así que lo posterior se incorpora dentro del ancestro o lo reemplaza.
+    combinado = {}
+    for cambios in lote:
+        for ruta, valor in cambios.items():
+            ruta = ruta.strip("/")
+            ancestro = next((r for r in combinado if ruta.startswith(r + "/")), None)
+            if ancestro is not None:
+                resto = ruta[len(ancestro) + 1:].split("/")
+                combinado[ancestro] = _fijar_anidado(combinado[ancestro], resto, valor)
+                continue
+            for descendiente in [r for r in combinado if r.startswith(ruta + "/")]:
+                del combinado[descendiente]
+            combinado[ruta] = valor
+    return combinado
+
+
+# --- RECONCILIACIÓN EN SEGUNDO PLANO ---
+class Reconciliador:
+    # Cola de escritura diferida: las sesiones solo escriben en el almacén local y despiertan este hilo,
+    # que agrupa todo lo pendiente en un único PATCH, reintenta con espera exponencial y cada
+    # cierto intervalo trae lo que cambió en la nube. Solo se sincronizan las particiones de los
+    # últimos MESES_EN_VIVO meses; los meses viejos se traen una vez, cuando alguien los pide.
+    # Los oyentes reciben los cambios remotos como {(coleccion, clave): registro o None};
+    # los oyentes_estado reciben {"pendientes": int, "error": str o None}.
+    def __init__(self, almacen, intervalo=30, demora_agrupado=0.3, espera_maxima=60):
+        self.almacen = almacen
+        self.intervalo = intervalo
+        self.demora_agrupado = demora_agrupado
+        self.espera_maxima = espera_maxima
+        self.oyentes = []
+        self.oyentes_estado = []
+        self.fallos = 0
+        self.estado = {"pendientes": 0, "error": None}
+        self._despertar = threading.Event()
+        self._despertar.set()
+        self._traer_ya = True
+        self._a_traer = set()
+        self._hilo = None
+        self._escuchar = False
+        self._escuchas = {}
+        self._vivas = set()
+
+    @property
+    def en_vivo(self):
+        return set(alcance_en_vivo()) <= self._vivas
+
+    def iniciar(self):
+        if self._hilo is None:
+            self._hilo = threading.Thread(target=self._ciclo, name="reconciliador", daemon=True)
+            self._hilo.start()
+
+    def sincronizar_ahora(self, traer=False):
+        self._traer_ya = self._traer_ya or traer
+        self.avisar_estado(self.estado["error"])
+        self._despertar.set()
+
+    def pedir_particiones(self, particiones):
+        self._a_traer.update(particiones)
+        self._despertar.set()
+
+    def avisar_estado(self, error=None):
+        apartados = self.almacen.contar_apartados()
+        if error is None and apartados:
+            error = f"{apartados} cambios rechazados por la nube"
+        self.estado = {"pendientes": self.almacen.contar_pendientes(), "error": error, "apartados": apartados}
+        for oyente in list(self.oyentes_estado):
+            oyente(self.estado)
+
+    def _espera_reintento(self):
+        return min(self.espera_maxima, 2 ** self.fallos) * random.uniform(0.8, 1.2)
+
+    def _ciclo(self):
+        proxima_bajada = 0
+        while True:
+            if self.fallos:
+                # Durante la espera de reintento las escrituras nuevas se acumulan en la bandeja
+                time.sleep(self._espera_reintento())
+                METRICAS.contar("nube.reintentos")
+            else:
+                self._despertar.wait(self.intervalo)
+                time.sleep(self.demora_agrupado)
+            self._despertar.clear()
+            try:
+                if not self.empujar():
+                    self.fallos += 1
+                    self.avisar_estado(f"Sin conexión (intento {self.fallos})")
+                    continue
+                self.fallos = 0
+                if self._traer_ya or (not self.en_vivo and time.monotonic() >= proxima_bajada):
+                    self._traer_ya = False
+                    proxima_bajada = time.monotonic() + self.intervalo
+                    self.traer(alcance_en_vivo())
+                if self._a_traer:
+                    particiones, self._a_traer = self._a_traer, set()
+                    self.traer(particiones)
+                self._asegurar_escuchas()
+                self.avisar_estado()
+            except Exception as e:
+                # Un error inesperado también espera antes de reintentar y queda a la vista
+                print(f"Error en la sincronización con la nube: {e}")
+                self.fallos += 1
+                self.avisar_estado(f"Error de sincronización (intento {self.fallos})")
+
+    def empujar(self):
+        lote = self.almacen.pendientes()
+        if not lote:
+            return True
+        METRICAS.registrar("nube.cambios_por_subida", len(lote))
+        try:
+            if not guardar_cambios(combinar(cambios for _, cambios in lote)):
+                return False
+            self.almacen.confirmar([id_ for id_, _ in lote])
+            return True
+        except CambiosRechazados:
+            pass
+        # Algo del lote es inválido: se sube de a un cambio para apartar solo los rechazados
+        # y que el resto no quede trabado detrás
+        for id_, cambios in lote:
+            try:
+                if not guardar_cambios(cambios):
+                    return False
+            except CambiosRechazados as e:
+                print(f"Alerta: La nube rechazó un cambio, queda apartado. {e}")
+                self.almacen.apartar(id_, str(e))
+                continue
+            self.almacen.confirmar([id_])
+        return True
+
+    def traer(self, particiones):
+        # El ETag se guarda recién después de fusionar: identifica lo que ya está en la copia local.
+        # Devuelve False si no se pudo bajar (queda pedido para la próxima vuelta).
+        etags = self.almacen.etags(particiones)
+        remoto = descargar_nube(particiones, etags)
+        if remoto is None:
+            self._a_traer.update(p for p in particiones if p not in alcance_en_vivo())
+            return False
+        self._fusionar(self._diferencias(remoto))
+        self.almacen.guardar_etags({p: etags[p] for p in remoto if p in etags})
+        return True
+
+    def _diferencias(self, remoto):
+        # remoto: {(coleccion, mes): {clave: registro}} con el contenido completo de esas particiones
+        registros = {}
+        local = self.almacen.cargar(list(remoto))
+        for particion_, datos in remoto.items():
+            coleccion = particion_[0]
+            for clave, registro in datos.items():
+                if local[particion_].get(clave) != registro:
+                    registros[(coleccion, clave)] = registro
+            for clave in local[particion_].keys() - datos.keys():
+                registros[(coleccion, clave)] = None
+        return registros
+
+    def _fusionar(self, registros):
+        aplicados = self.almacen.guardar_remoto(registros) if registros else {}
+        if aplicados:
+            for oyente in list(self.oyentes):
+                oyente(aplicados)
+
+    # --- SINCRONIZACIÓN EN VIVO (REST streaming de Firebase) ---
+    def escuchar_en_vivo(self):
+        self._escuchar = True
+        self._asegurar_escuchas()
+
+    def _asegurar_escuchas(self):
+        # Una escucha por partición en vivo: al cambiar de mes se abren las nuevas y las viejas se cierran solas
+        if not self._escuchar:
+            return
+        for particion_ in alcance_en_vivo():
+            if particion_ not in self._escuchas:
+                self._escuchas[particion_] = threading.Thread(
+                    target=self._ciclo_vivo, args=(particion_,), name=f"escucha-{ruta_particion(*particion_)}", daemon=True
+                )
+                self._escuchas[particion_].start()
+
+    def _ciclo_vivo(self, particion_):
+        ruta = ruta_particion(*particion_)
+        fallos = 0
+        while particion_ in alcance_en_vivo():
+            try:
+                for evento, datos in eventos_nube(ruta):
+                    if evento in ("put", "patch"):
+                        self._vivas.add(particion_)
+                        fallos = 0
+                        self.aplicar_evento(evento, f"{ruta}/{datos['path'].strip('/')}", datos["data"])
+                    elif evento in ("cancel", "auth_revoked"):
+                        raise ConnectionError(f"Firebase cerró la escucha ({evento})")
+                    if particion_ not in alcance_en_vivo():
+                        break
+            except Exception as e:
+                METRICAS.contar("nube.escucha_cortes")
+                print(f"Alerta: Se cortó la escucha en vivo de {ruta}. {e}")
+            # Mientras la escucha está caída vuelven las bajadas periódicas
+            self._vivas.discard(particion_)
+            fallos += 1
+            time.sleep(min(self.espera_maxima, 2 ** fallos) * random.uniform(0.8, 1.2))
+        self._escuchas.pop(particion_, None)
+
+    def aplicar_evento(self, evento, ruta, datos):
+        METRICAS.contar("nube.eventos_vivo")
+        registros = {}
+        if evento == "patch":
+            for sub, valor in datos.items():
+                self._registros_evento(registros, f"{ruta.rstrip('/')}/{sub}", valor)
+        else:
+            self._registros_evento(registros, ruta, datos)
+        self._fusionar(registros)
+
+    def _registros_evento(self, registros, ruta, datos):
+        partes = partes_ruta(ruta)
+        if partes is None:
+            return
+        coleccion, mes, clave, campos = partes
+        if clave is None and coleccion in COLECCIONES_POR_MES and mes is None:
+            for mes_, contenido in (datos or {}).items():
+                self._registros_evento(registros, ruta_particion(coleccion, mes_), contenido)
+        elif clave is None:
+            datos = {k: decodificar(coleccion, r) for k, r in _a_diccionario(datos).items()}
+            registros.update(self._diferencias({(coleccion, mes): datos}))
+        elif not campos:
+            registros[(coleccion, clave)] = decodificar(coleccion, datos)
+        else:
+            actual = registros[(coleccion, clave)] if (coleccion, clave) in registros else self.almacen.leer(coleccion, clave)
+            registros[(coleccion, clave)] = _fijar_anidado(actual, campos, datos) or None
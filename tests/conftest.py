@@ -0,0 +1,42 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import firebase_local
+import sincronizacion
+from almacen_local import AlmacenLocal
+
+
+@pytest.fixture
+def nube(monkeypatch):
+    # Firebase local vacío; nube.arbol es el árbol en memoria y se llena con nube.arbol.fijar(...)
+    servidor, url = firebase_local.iniciar_servidor()
+    monkeypatch.setattr(sincronizacion, "FIREBASE_URL", f"{url}/caja_repuestos")
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+
+@pytest.fixture
+def almacen(tmp_path):
+    almacen = AlmacenLocal(str(tmp_path / "caja_local.db"))
+    yield almacen
+    almacen.conexion.close()
+
+
+@pytest.fixture
+def pagina(nube, almacen):
+    # main() sobre una página sin navegador, con la sesión ya iniciada
+    import app_prueba
+    from pagina_simulada import PaginaSimulada
+
+    app_prueba._servicios.clear()
+    app_prueba.iniciar_servicios(almacen, en_segundo_plano=False)
+    pagina = PaginaSimulada({})
+    app_prueba.main(pagina)
+    pagina.iniciar_sesion()
+    yield pagina
+    app_prueba._servicios.clear()
@@ -0,0 +1,34 @@
+import json
+
+from almacen_local import AlmacenLocal
+
+VENTA = {"fecha": "2026-10-18", "usuario": "Sergio", "medio": "EFECTIVO", "monto": 100.0}
+
+
+def test_guardar_remoto_respeta_cambios_sin_subir(almacen):
+    almacen.guardar({("movimientos", "k1"): VENTA}, {"movimientos/2026-10/k1": VENTA})
+    almacen.guardar({("movimientos", "k2"): VENTA})
+    remoto = {**VENTA, "monto": 999.0}
+    aplicados = almacen.guardar_remoto({("movimientos", "k1"): remoto, ("movimientos", "k2"): remoto, ("movimientos", "k3"): VENTA})
+    assert aplicados == {("movimientos", "k2"): remoto, ("movimientos", "k3"): VENTA}
+    assert almacen.leer("movimientos", "k1") == VENTA
+
+
+def test_guardar_remoto_devuelve_solo_lo_que_cambio(almacen):
+    almacen.guardar({("movimientos", "k1"): VENTA})
+    assert almacen.guardar_remoto({("movimientos", "k1"): dict(VENTA)}) == {}
+
+
+def test_filas_en_formato_anterior_se_reescriben_al_abrir(tmp_path):
+    ruta = str(tmp_path / "vieja.db")
+    almacen = AlmacenLocal(ruta)
+    with almacen.conexion:
+        almacen.conexion.execute(
+            "INSERT INTO registros (coleccion, clave, datos, particion) VALUES (?, ?, ?, ?)",
+            ("movimientos", "k1", json.dumps(VENTA), "2026-10"),
+        )
+    almacen.conexion.close()
+    almacen = AlmacenLocal(ruta)
+    datos = almacen.conexion.execute("SELECT datos FROM registros").fetchone()[0]
+    assert json.loads(datos) == [739907, 2, 0, 10000]
+    assert almacen.cargar([("movimientos", "2026-10")]) == {("movimientos", "2026-10"): {"k1": VENTA}}
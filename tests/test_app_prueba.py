@@ -0,0 +1,111 @@
+import flet as ft
+import pytest
+
+from app_prueba import leer_lote
+
+MONTOS = [
+    ("1500", 1500), ("1500.50", 1500.5), ("1500,50", 1500.5), ("1.500", 1500), ("$1.500", 1500),
+    ("$1.500,50", 1500.5), ("1.500.000", 1500000), ("1.50", 1.5),
+]
+MONTOS_INVALIDOS = ["1500.500", "1.50,5", "0", "-1.500", "abc", "inf", "nan"]
+
+
+def test_los_avisos_reutilizan_un_solo_snackbar_sin_update_completo(pagina):
+    overlay = len(pagina.overlay)
+    completos = pagina.updates_completos
+    for monto in ("100", "200", "300"):
+        pagina.escribir("Monto Ingreso ($)", monto)
+        pagina.clic("➕ Agregar Ingreso")
+    assert len(pagina.overlay) == overlay
+    assert pagina.updates_completos == completos
+    alerta = next(c for c in pagina.overlay if isinstance(c, ft.SnackBar))
+    assert alerta.open and alerta.content.value == "Ingreso registrado en la planilla."
+    assert pagina.control(ft.TextField, label="Monto Ingreso ($)").value == ""
+
+
+def test_si_la_carga_falla_el_login_avisa_y_reintenta(nube, almacen, monkeypatch):
+    import app_prueba
+    from pagina_simulada import PaginaSimulada
+
+    iniciar_servicios, cargar_datos = app_prueba.iniciar_servicios, app_prueba.cargar_datos
+
+    def falla(almacen_):
+        raise OSError("disco lleno")
+
+    app_prueba._servicios.clear()
+    monkeypatch.setattr(app_prueba, "iniciar_servicios", lambda: iniciar_servicios(almacen, en_segundo_plano=False))
+    monkeypatch.setattr(app_prueba, "cargar_datos", falla)
+    pagina = PaginaSimulada({})
+    app_prueba.main(pagina)
+    pantalla_login = pagina.controls[0]
+    assert "disco lleno" in pagina.control(ft.Text, color="red_700", visible=True).value
+    assert not app_prueba._servicios
+
+    pagina.iniciar_sesion()
+    alerta = next(c for c in pagina.overlay if isinstance(c, ft.SnackBar))
+    assert alerta.open and "disco lleno" in alerta.content.value
+    assert pantalla_login.visible is not False
+
+    monkeypatch.setattr(app_prueba, "cargar_datos", cargar_datos)
+    pagina.iniciar_sesion()
+    assert pantalla_login.visible is False
+    app_prueba._servicios.clear()
+
+
+def test_montos_no_finitos_se_rechazan_sin_guardar(pagina, almacen):
+    pendientes = almacen.contar_pendientes()
+    alerta = next(c for c in pagina.overlay if isinstance(c, ft.SnackBar))
+    for campo, boton in (("Monto Ingreso ($)", "➕ Agregar Ingreso"), ("Monto Salida ($)", "➖ Extraer / Registrar Salida")):
+        for texto in ("inf", "-inf", "nan", "1e400"):
+            pagina.escribir(campo, texto)
+            pagina.clic(boton)
+            assert alerta.content.value == "Monto inválido."
+    assert almacen.contar_pendientes() == pendientes
+
+
+@pytest.mark.parametrize("texto, monto", MONTOS)
+def test_lote_lee_los_formatos_de_monto(texto, monto):
+    assert leer_lote(f"{texto} t", "EFECTIVO") == [(1, monto, "TARJETA / VIRTUAL", None)]
+
+
+@pytest.mark.parametrize("texto", MONTOS_INVALIDOS)
+def test_lote_rechaza_montos_ambiguos_o_invalidos(texto):
+    [(_, monto, _, error)] = leer_lote(texto, "EFECTIVO")
+    assert monto is None and error == f"'{texto}' no es un monto válido"
+
+
+def test_lote_confirma_el_medio_que_muestra_la_vista_previa(pagina, almacen):
+    pagina.control(ft.TextButton, text="⚡ Carga por Lote").on_click(None)
+    lote = pagina.control(ft.TextField, label="Ventas del lote (una por línea: monto y medio, ej: 1500 t)")
+    lote.value = "1.500\n200 e"
+    lote.on_change(None)
+    medio = pagina.control(ft.Dropdown, value="EFECTIVO")
+    medio.value = "TARJETA / VIRTUAL"
+    medio.on_change(None)
+    assert pagina.control(ft.Text, value="1. $1,500.00 - TARJETA / VIRTUAL (provisoria)")
+
+    pagina.clic("✅ Confirmar Lote")
+    [(_, cambios)] = almacen.pendientes()
+    assert sorted((r["monto"], r["medio"]) for r in cambios.values()) == [(200, "EFECTIVO"), (1500, "TARJETA / VIRTUAL")]
+
+
+@pytest.mark.parametrize("texto", [texto for texto, _ in MONTOS] + MONTOS_INVALIDOS)
+def test_carga_suelta_y_por_lote_leen_igual_el_monto(pagina, almacen, texto):
+    [(_, esperado, _, _)] = leer_lote(texto, "EFECTIVO")
+    alerta = next(c for c in pagina.overlay if isinstance(c, ft.SnackBar))
+    pagina.clic("🚚 Proveedores")
+    for campo, boton in (
+        ("Monto Ingreso ($)", "➕ Agregar Ingreso"),
+        ("Monto Salida ($)", "➖ Extraer / Registrar Salida"),
+        ("Monto de la Factura ($)", "Guardar Factura"),
+    ):
+        pagina.escribir("Nombre del Proveedor", "Bosch")
+        pagina.escribir("Vencimiento (DD/MM/YYYY)", "30/10/2026")
+        pagina.escribir(campo, texto)
+        antes = almacen.contar_pendientes()
+        pagina.clic(boton)
+        if esperado is None:
+            assert almacen.contar_pendientes() == antes and "monto" in alerta.content.value.lower()
+        else:
+            [registro] = almacen.pendientes()[-1][1].values()
+            assert registro["monto"] == esperado
@@ -0,0 +1,142 @@
+from datetime import date
+
+import openpyxl
+import pytest
+
+import compactacion
+import sincronizacion
+from compactacion import compactar_mes, compactar_meses_cerrados, meses_a_compactar
+from exportar import exportar_excel
+from registros import codificar
+from sincronizacion import alcance, meses_hasta
+
+HOY = date(2026, 10, 18)
+
+
+def _venta(fecha, monto, medio="EFECTIVO"):
+    return {"fecha": fecha, "usuario": "Sergio", "medio": medio, "monto": monto}
+
+
+def _sembrar(nube):
+    nube.arbol.fijar("caja_repuestos/movimientos/2026-08", {
+        "a": codificar("movimientos", _venta("2026-08-03", 100.10)),
+        "b": codificar("movimientos", _venta("2026-08-04", 200.20, "TARJETA / VIRTUAL")),
+    })
+    nube.arbol.fijar("caja_repuestos/gastos/2026-08", {
+        "g": codificar("gastos", {"fecha": "2026-08-04", "usuario": "Mamá", "categoria": "Gasto Vario", "monto": 50}),
+    })
+    nube.arbol.fijar("caja_repuestos/movimientos/2026-10", {"c": codificar("movimientos", _venta("2026-10-16", 10))})
+
+
+def test_compactar_mes_archiva_y_resume(nube):
+    _sembrar(nube)
+    assert compactar_mes("2026-08", "Sergio")
+    assert nube.arbol.obtener("caja_repuestos/movimientos/2026-08") is None
+    assert nube.arbol.obtener("caja_repuestos/gastos/2026-08") is None
+    assert set(nube.arbol.obtener("caja_repuestos/archivo/movimientos/2026-08")) == {"a", "b"}
+    resumen = nube.arbol.obtener("caja_repuestos/resumenes/2026-08")
+    assert (resumen["ingresos"], resumen["gastos"], resumen["cantidad_movimientos"]) == (30030, 5000, 2)
+    assert {e["medio"]: e["total"] for e in resumen["por_medio"]} == {"EFECTIVO": 10010, "TARJETA / VIRTUAL": 20020}
+    # El mes en curso no se toca
+    assert nube.arbol.obtener("caja_repuestos/movimientos/2026-10") is not None
+
+
+def test_meses_a_compactar_saltea_meses_con_cambios_sin_subir(nube, almacen):
+    _sembrar(nube)
+    assert meses_a_compactar(HOY, almacen) == ["2026-08"]
+    almacen.guardar({("gastos", "x"): None}, {"gastos/2026-08/x": None})
+    assert meses_a_compactar(HOY, almacen) == []
+
+
+def test_fila_tardia_durante_la_compactacion_no_se_pierde(nube, almacen, monkeypatch):
+    # Otro equipo sube una venta del mes entre la lectura y el DELETE: el DELETE condicional falla (412)
+    # y el mes se vuelve a compactar con la fila nueva
+    _sembrar(nube)
+    guardar_original = compactacion.guardar_cambios
+    llamadas = []
+
+    def guardar_y_llega_tarde(cambios):
+        llamadas.append(cambios)
+        escrito = guardar_original(cambios)
+        if len(llamadas) == 1:
+            nube.arbol.fijar("caja_repuestos/movimientos/2026-08/tarde", codificar("movimientos", _venta("2026-08-30", 5)))
+        return escrito
+
+    monkeypatch.setattr(compactacion, "guardar_cambios", guardar_y_llega_tarde)
+    assert compactar_meses_cerrados(HOY, almacen, "Sergio") == ["2026-08"]
+    assert len(llamadas) == 2
+    assert nube.arbol.obtener("caja_repuestos/movimientos/2026-08") is None
+    assert set(nube.arbol.obtener("caja_repuestos/archivo/movimientos/2026-08")) == {"a", "b", "tarde"}
+    resumen = nube.arbol.obtener("caja_repuestos/resumenes/2026-08")
+    assert (resumen["ingresos"], resumen["cantidad_movimientos"]) == (30530, 3)
+
+
+def test_fila_tardia_en_cada_intento_deja_el_mes_sin_borrar(nube, almacen, monkeypatch):
+    _sembrar(nube)
+    guardar_original = compactacion.guardar_cambios
+    n = [0]
+
+    def siempre_llega_otra(cambios):
+        escrito = guardar_original(cambios)
+        n[0] += 1
+        nube.arbol.fijar(f"caja_repuestos/movimientos/2026-08/tarde{n[0]}", codificar("movimientos", _venta("2026-08-30", 1)))
+        return escrito
+
+    monkeypatch.setattr(compactacion, "guardar_cambios", siempre_llega_otra)
+    assert compactar_meses_cerrados(HOY, almacen, "Sergio") == []
+    calientes = set(nube.arbol.obtener("caja_repuestos/movimientos/2026-08"))
+    archivadas = set(nube.arbol.obtener("caja_repuestos/archivo/movimientos/2026-08"))
+    # Ninguna fila se perdió: todas siguen calientes y las ya archivadas están en los dos lados
+    assert {"a", "b", "tarde1", "tarde2", "tarde3"} <= calientes
+    assert archivadas <= calientes
+
+
+def _historia_con_mes_cerrado(nube):
+    # 20 ventas en un mes ya fuera de la planilla y una en el mes en curso, con fechas relativas a hoy
+    actual, _, cerrado = meses_hasta(date.today(), 3)
+    nube.arbol.fijar(f"caja_repuestos/movimientos/{cerrado}", {
+        f"v{i}": codificar("movimientos", _venta(f"{cerrado}-{i + 1:02d}", 100 + i)) for i in range(20)
+    })
+    nube.arbol.fijar(f"caja_repuestos/movimientos/{actual}", {"c": codificar("movimientos", _venta(f"{actual}-01", 10))})
+    return cerrado
+
+
+def _exportar_sin_conexion(monkeypatch, tmp_path, app_prueba, desde):
+    monkeypatch.setattr(sincronizacion, "FIREBASE_URL", "http://127.0.0.1:9/caja_repuestos")
+    ruta = exportar_excel(str(tmp_path / "caja.xlsx"), app_prueba.leer_particion, desde, date.today())
+    hoja = openpyxl.load_workbook(ruta)["Ingresos"]
+    return hoja.max_row - 2
+
+
+def test_exportar_sin_conexion_incluye_los_meses_compactados(nube, almacen, monkeypatch, tmp_path):
+    import app_prueba
+
+    cerrado = _historia_con_mes_cerrado(nube)
+    app_prueba._servicios.clear()
+    reconciliador = app_prueba.iniciar_servicios(almacen, en_segundo_plano=False)["reconciliador"]
+    reconciliador.traer(alcance(meses_hasta(date.today(), 3)))
+
+    app_prueba.compactar_en_segundo_plano("Sergio")
+    particiones, reconciliador._a_traer = reconciliador._a_traer, set()
+    assert reconciliador.traer(particiones)
+    # En la copia local las filas pasaron del mes caliente al archivo frío
+    assert almacen.cargar([("movimientos", cerrado)]) == {("movimientos", cerrado): {}}
+    assert len(almacen.cargar([("archivo/movimientos", cerrado)])[("archivo/movimientos", cerrado)]) == 20
+
+    assert _exportar_sin_conexion(monkeypatch, tmp_path, app_prueba, date.fromisoformat(f"{cerrado}-01")) == 21
+    app_prueba._servicios.clear()
+
+
+def test_exportar_sin_conexion_ni_copia_del_archivo_falla(nube, almacen, monkeypatch, tmp_path):
+    # Otro equipo compactó el mes y este nunca bajó el archivo: mejor un error que una planilla incompleta
+    import app_prueba
+
+    cerrado = _historia_con_mes_cerrado(nube)
+    assert compactar_meses_cerrados(date.today(), almacen, "Sergio") == [cerrado]
+    app_prueba._servicios.clear()
+    reconciliador = app_prueba.iniciar_servicios(almacen, en_segundo_plano=False)["reconciliador"]
+    reconciliador.traer([("resumenes", None)])
+
+    with pytest.raises(ConnectionError):
+        _exportar_sin_conexion(monkeypatch, tmp_path, app_prueba, date.fromisoformat(f"{cerrado}-01"))
+    app_prueba._servicios.clear()
@@ -0,0 +1,25 @@
+from datetime import date
+
+from app_prueba import construir_indices, estadisticas, fijar_registro
+from sincronizacion import COLECCIONES
+
+HOY = date(2026, 10, 18)
+
+
+def _bd():
+    bd = construir_indices({c: {} for c in COLECCIONES})
+    for i, (fecha, monto) in enumerate([("2025-09-30", 100), ("2025-10-18", 10), ("2025-10-19", 1000), ("2026-10-01", 5)]):
+        fijar_registro(bd, "movimientos", f"k{i}", {"fecha": fecha, "usuario": "Sergio", "medio": "EFECTIVO", "monto": monto})
+    return bd
+
+
+def test_año_anterior_a_la_fecha_corta_el_mes_en_el_dia_de_hoy():
+    assert estadisticas(_bd(), HOY)["ingresos_año_anterior_a_la_fecha"] == 11000
+
+
+def test_año_anterior_a_la_fecha_con_el_mes_resumido():
+    bd = _bd()
+    resumen = {"ingresos": 101000, "gastos": 0, "por_medio": [], "por_categoria": [],
+               "por_dia": [{"fecha": "2025-10-18", "ingresos": 1000}, {"fecha": "2025-10-19", "ingresos": 100000}]}
+    fijar_registro(bd, "resumenes", "2025-10", resumen)
+    assert estadisticas(bd, HOY)["ingresos_año_anterior_a_la_fecha"] == 11000
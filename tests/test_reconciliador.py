@@ -0,0 +1,81 @@
+from registros import codificar
+from sincronizacion import Reconciliador, eventos_nube, guardar_cambios
+
+VENTA = {"fecha": "2026-10-18", "usuario": "Sergio", "medio": "EFECTIVO", "monto": 100.0}
+
+
+def _encolar(almacen, cambios):
+    almacen.guardar({}, cambios)
+
+
+def test_empujar_agrupa_la_bandeja_en_una_subida(nube, almacen):
+    _encolar(almacen, {"movimientos/2026-10/k1": VENTA})
+    _encolar(almacen, {"movimientos/2026-10/k2": VENTA})
+    assert Reconciliador(almacen).empujar()
+    assert almacen.contar_pendientes() == 0
+    assert set(nube.arbol.obtener("caja_repuestos/movimientos/2026-10")) == {"k1", "k2"}
+
+
+def test_cambio_invalido_se_aparta_y_no_traba_al_resto(nube, almacen):
+    _encolar(almacen, {"movimientos/2026-10/k1": VENTA})
+    _encolar(almacen, {"facturas_pendientes/f1": {"proveedor": "Bosch", "monto": float("nan")}})
+    _encolar(almacen, {"facturas_pendientes/f.2": {"proveedor": "SKF", "monto": 10}})
+    _encolar(almacen, {"movimientos/2026-10/k2": VENTA})
+    reconciliador = Reconciliador(almacen)
+    estados = []
+    reconciliador.oyentes_estado.append(estados.append)
+
+    assert reconciliador.empujar()
+    assert almacen.contar_pendientes() == 0
+    assert almacen.contar_apartados() == 2
+    assert set(nube.arbol.obtener("caja_repuestos/movimientos/2026-10")) == {"k1", "k2"}
+    assert nube.arbol.obtener("caja_repuestos/facturas_pendientes") is None
+    reconciliador.avisar_estado()
+    assert estados[-1]["error"] == "2 cambios rechazados por la nube"
+
+
+def test_sin_conexion_la_bandeja_queda_intacta(almacen, monkeypatch):
+    import sincronizacion
+    monkeypatch.setattr(sincronizacion, "FIREBASE_URL", "http://127.0.0.1:9/caja_repuestos")
+    _encolar(almacen, {"movimientos/2026-10/k1": VENTA})
+    assert not Reconciliador(almacen).empujar()
+    assert (almacen.contar_pendientes(), almacen.contar_apartados()) == (1, 0)
+
+
+def test_eventos_en_vivo_llegan_a_la_copia_local_y_a_los_oyentes(nube, almacen):
+    # Un put inicial, un patch con una venta nueva y un patch de un solo campo, leídos del stream
+    nube.arbol.fijar("caja_repuestos/movimientos/2026-10/k1", codificar("movimientos", VENTA))
+    factura = {"proveedor": "Bosch", "monto": 10, "vencimiento": "30/10/2026", "estado": "PENDIENTE"}
+    nube.arbol.fijar("caja_repuestos/facturas_pendientes/f1", factura)
+    reconciliador = Reconciliador(almacen)
+    recibidos = []
+    reconciliador.oyentes.append(recibidos.append)
+
+    def siguiente(flujo, ruta):
+        evento, datos = next(e for e in flujo if e[0] in ("put", "patch"))
+        reconciliador.aplicar_evento(evento, f"{ruta}/{datos['path'].strip('/')}", datos["data"])
+        return evento, datos
+
+    ventas = eventos_nube("movimientos/2026-10")
+    facturas = eventos_nube("facturas_pendientes")
+    try:
+        assert siguiente(ventas, "movimientos/2026-10")[0] == "put"
+        assert recibidos[-1] == {("movimientos", "k1"): VENTA}
+        siguiente(facturas, "facturas_pendientes")
+        assert almacen.leer("facturas_pendientes", "f1") == factura
+
+        # Un PATCH multi-ruta en la raíz: cada escucha recibe solo lo suyo, relativo a su ruta
+        venta = {**VENTA, "monto": 250.0}
+        assert guardar_cambios({"movimientos/2026-10/k2": venta, "gastos/2026-10/g1": {**VENTA, "categoria": "Gasto Vario"}})
+        assert siguiente(ventas, "movimientos/2026-10") == ("patch", {"path": "/", "data": {"k2": codificar("movimientos", venta)}})
+        assert recibidos[-1] == {("movimientos", "k2"): venta}
+        assert almacen.leer("movimientos", "k2") == venta
+
+        assert guardar_cambios({"facturas_pendientes/f1/estado": "PAGADO"})
+        assert siguiente(facturas, "facturas_pendientes") == ("patch", {"path": "/", "data": {"f1/estado": "PAGADO"}})
+        assert recibidos[-1] == {("facturas_pendientes", "f1"): {**factura, "estado": "PAGADO"}}
+        assert almacen.leer("facturas_pendientes", "f1")["estado"] == "PAGADO"
+        assert len(recibidos) == 4
+    finally:
+        ventas.close()
+        facturas.close()
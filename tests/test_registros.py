@@ -0,0 +1,29 @@
+from registros import Gasto, Movimiento, centavos, codificar, decodificar
+
+
+def test_ida_y_vuelta():
+    venta = {"fecha": "2026-10-18", "usuario": "Sergio", "medio": "TARJETA / VIRTUAL", "monto": 1500.1}
+    assert codificar("movimientos", venta) == [739907, 2, 1, 150010]
+    assert decodificar("movimientos", codificar("movimientos", venta)) == venta
+    gasto = {"fecha": "2026-10-18", "usuario": "Otro", "categoria": "Varios", "monto": 12.0, "detalle": "Filtros"}
+    assert codificar("gastos", gasto) == [739907, "Otro", "Varios", 1200, "Filtros"]
+    assert decodificar("gastos", codificar("gastos", gasto)) == gasto
+
+
+def test_formato_anterior_y_otras_colecciones_pasan_tal_cual():
+    venta = {"fecha": "2026-10-18", "usuario": "Sergio", "medio": "EFECTIVO", "monto": 10}
+    assert decodificar("movimientos", venta) is venta
+    cierre = {"fecha": "2026-10-18", "hora_cierre": "19:30"}
+    assert codificar("cierres", cierre) is cierre
+
+
+def test_lista_incompleta_devuelta_como_objeto():
+    assert decodificar("gastos", {"0": 739907, "1": 1, "3": 5}) == {
+        "fecha": "2026-10-18", "usuario": "Julián", "categoria": "", "monto": 0.05, "detalle": "",
+    }
+
+
+def test_centavos_exactos():
+    assert sum(centavos(0.1) for _ in range(10)) == 100
+    assert Movimiento({"fecha": "2026-10-18", "monto": 0.29}).centavos == 29
+    assert Gasto({"fecha": "2026-10-18", "monto": 1}).categoria == "Sin categoría"
@@ -0,0 +1,44 @@
+from sincronizacion import combinar, descargar_nube, guardar_cambios, partes_ruta
+
+
+def test_partes_ruta():
+    assert partes_ruta("movimientos/2026-10/k1") == ("movimientos", "2026-10", "k1", [])
+    assert partes_ruta("movimientos/2026-10") == ("movimientos", "2026-10", None, [])
+    assert partes_ruta("facturas_pendientes/k1/estado") == ("facturas_pendientes", None, "k1", ["estado"])
+    assert partes_ruta("facturas_pagadas/k1") == ("facturas_pagadas", None, "k1", [])
+    assert partes_ruta("archivo/movimientos/2026-10/k1") is None
+
+
+def test_combinar_incorpora_lo_posterior_en_el_ancestro():
+    combinado = combinar([
+        {"facturas_pendientes/k1": {"proveedor": "Bosch", "estado": "PENDIENTE"}},
+        {"facturas_pendientes/k1/estado": "PAGADO"},
+    ])
+    assert combinado == {"facturas_pendientes/k1": {"proveedor": "Bosch", "estado": "PAGADO"}}
+
+
+def test_combinar_reemplaza_descendientes():
+    combinado = combinar([
+        {"facturas_pendientes/k1/estado": "PAGADO", "movimientos/2026-10/k2": [1]},
+        {"facturas_pendientes/k1": None},
+    ])
+    assert combinado == {"movimientos/2026-10/k2": [1], "facturas_pendientes/k1": None}
+
+
+def test_ida_y_vuelta_contra_la_nube(nube):
+    venta = {"fecha": "2026-10-16", "usuario": "Sergio", "medio": "EFECTIVO", "monto": 1500.5}
+    assert guardar_cambios({"movimientos/2026-10/k1": venta})
+    etags = {}
+    assert descargar_nube([("movimientos", "2026-10")], etags) == {("movimientos", "2026-10"): {"k1": venta}}
+    assert etags[("movimientos", "2026-10")]
+    # Sin cambios en la nube (mismo ETag) la partición no se devuelve; con cambios, sí
+    assert descargar_nube([("movimientos", "2026-10")], etags) == {}
+    assert guardar_cambios({"movimientos/2026-10/k2": venta})
+    assert set(descargar_nube([("movimientos", "2026-10")], etags)[("movimientos", "2026-10")]) == {"k1", "k2"}
+
+
+def test_la_nube_guarda_filas_compactas(nube):
+    venta = {"fecha": "2026-10-16", "usuario": "Sergio", "medio": "EFECTIVO", "monto": 1500.5}
+    assert guardar_cambios({"movimientos/2026-10/k1": venta})
+    assert nube.arbol.obtener("caja_repuestos/movimientos/2026-10/k1") == [739905, 2, 0, 150050]
+    assert descargar_nube([("movimientos", "2026-10")]) == {("movimientos", "2026-10"): {"k1": venta}}